@@ -5,6 +5,19 @@ Written by Z. Duputel, December 2013
 '''
 
 # Base class
-from .sac import sac
+from .sac import sac, set_precision
+from .sacarray import SacArray
+from .bulk import read_many
+from .archive import SacArchive
+from .header import SacHeader, read_header
+from .aio import aread, aread_many, awrite
+from .merge import merge
 
 from . import decimate
+from . import resample
+from . import filters
+from . import response
+from . import fftbackend
+from .fftbackend import set_fft_backend
+from . import profiling
+from .profiling import stats, profile
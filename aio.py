@@ -0,0 +1,88 @@
+'''
+Asyncio interface to read and write sac files without blocking the event
+loop (file operations are run in a thread pool, which overlaps the latency
+of many outstanding reads on network storage)
+'''
+
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .bulk import expand, read_one
+
+
+async def aread(path, executor=None, headers_only=False, **kwargs):
+    '''
+    Read a sac file
+    Returns a sac object (or a SacHeader, see bulk.read_one)
+    Args:
+        * path: sac file name
+        * executor: concurrent.futures executor (default: event loop executor)
+        * headers_only: if True, only read headers
+        * kwargs: other arguments passed to read_one and sac.read (e.g., compact, window)
+    '''
+    loop = asyncio.get_running_loop()
+    func = functools.partial(read_one,path,headers_only,**kwargs)
+    # All done
+    return await loop.run_in_executor(executor,func)
+
+
+async def aread_many(paths_or_glob, concurrency=64, executor=None, headers_only=False, **kwargs):
+    '''
+    Read sac files concurrently
+    Yields (path, sac object) in input order. If a file cannot be read, the
+    corresponding exception is yielded instead of the sac object (as for
+    bulk.iread_many). At most concurrency files are read ahead of the
+    consumer (back-pressure).
+    Args:
+        * paths_or_glob: list of file names, directory or glob pattern
+        * concurrency: maximum number of outstanding reads
+        * executor: concurrent.futures executor (default: a thread pool with
+                    concurrency threads, created for this call)
+        * headers_only: if True, only read headers
+        * kwargs: other arguments passed to read_one and sac.read
+    '''
+    assert concurrency > 0, 'concurrency must be positive'
+    paths = expand(paths_or_glob)
+    pool  = executor if executor is not None else ThreadPoolExecutor(concurrency)
+    try:
+        pending = deque()
+        for path in paths:
+            pending.append((path,asyncio.ensure_future(aread(path,pool,headers_only,**kwargs))))
+            if len(pending) >= concurrency:
+                yield await _result(*pending.popleft())
+        while pending:
+            yield await _result(*pending.popleft())
+    finally:
+        for path,task in pending:
+            task.cancel()
+        if executor is None:
+            pool.shutdown(wait=False,cancel_futures=True)
+
+    # All done
+
+
+async def awrite(tr, path, byteorder='native', executor=None):
+    '''
+    Write a sac file
+    Args:
+        * tr: sac object
+        * path: output sac file name
+        * byteorder: see sac.write
+        * executor: concurrent.futures executor (default: event loop executor)
+    '''
+    loop = asyncio.get_running_loop()
+    func = functools.partial(tr.write,path,byteorder)
+    # All done
+    return await loop.run_in_executor(executor,func)
+
+
+async def _result(path, task):
+    '''
+    Returns (path, sac object) or (path, exception)
+    '''
+    try:
+        return path, await task
+    except Exception as e:
+        return path, e
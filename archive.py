@@ -0,0 +1,373 @@
+'''
+Packed multi-trace archive of sac records
+
+An archive file includes sac records (632-byte header followed by the data
+points, i.e. the content of a sac file written by sac.write) stored back to
+back, followed by an index and a footer:
+    record 0 | record 1 | ... | index | footer
+    * index: one entry per record (offset in bytes, npts, id) with dtype
+             INDEX_DTYPE
+    * footer: FOOTER_DTYPE (magic, version, byte order of the records,
+              offset of the index, number of records)
+Records are in the native byte order of the machine that created the
+archive. The index is only written when the archive is flushed or closed.
+When records are appended, the file is first truncated after the last
+record and the index is re-written when the archive is flushed or closed.
+If the archive is not flushed (e.g., interrupted process), the index is
+rebuilt from the headers of the records when the archive is opened.
+'''
+
+import os
+import sys
+import numpy as np
+
+from .sac import sac, SacError, HEADER_SIZE, HEADER_DTYPE
+
+
+ARCHIVE_MAGIC   = b'SACARC'
+ARCHIVE_VERSION = 1
+FOOTER_DTYPE = np.dtype([('magic','S6'), ('version','u1'), ('endian','S1'),
+                         ('index','<u8'), ('count','<u8')])
+INDEX_DTYPE  = np.dtype([('offset','<u8'), ('npts','<i4'), ('id','S64')])
+
+
+class SacArchive(object):
+    '''
+    Packed archive of sac traces with random access by index or id
+    Usage:
+        with SacArchive('traces.sacarc','w') as arc:
+            arc.append(sacobj)
+        arc = SacArchive('traces.sacarc')
+        sacobj = arc[0]                 # by index
+        sacobj = arc['XX_STA_00_BHZ']   # by id (last appended trace with this id)
+    '''
+
+    def __init__(self,filename,mode='r'):
+        '''
+        Open an archive
+        Args:
+            * filename: archive file name
+            * mode: 'r' (read), 'w' (create or truncate) or 'a' (append, create
+                    the archive if it does not exist)
+        '''
+        assert mode in ('r','w','a'), 'mode must be r, w or a'
+        self.filename = filename
+        self.mode     = mode
+        self.offsets  = []
+        self.npts     = []
+        self.ids      = []
+        self.lookup   = {}
+        self.endian   = '<' if sys.byteorder == 'little' else '>'
+        self.end      = 0
+        self.modified = False
+        self._map     = None
+
+        # Open file
+        if mode == 'w' or (mode == 'a' and not os.path.exists(filename)):
+            self.fid = open(filename,'w+b')
+            self.modified = True
+            self.flush()
+        else:
+            self.fid = open(filename,'rb' if mode == 'r' else 'r+b')
+            self._readindex()
+            if mode == 'a':
+                assert self.endian == self.endian_records, \
+                    'Cannot append to an archive created with a different byte order'
+
+        # All done
+
+
+    def _readindex(self):
+        '''
+        Read the footer and index of the archive (or rebuild the index from
+        the records if the archive was not flushed, see _scanrecords)
+        '''
+        fid = self.fid
+        fid.seek(0,2)
+        fsize = fid.tell()
+        footer = self._footer(fsize - FOOTER_DTYPE.itemsize)
+        if footer is None: # Interrupted archive: rebuild the index
+            self._scanrecords(fsize)
+            return
+        if footer['version'] > ARCHIVE_VERSION:
+            raise SacError('Unsupported archive version (%d)'%(footer['version']))
+        count = int(footer['count'])
+        self.endian_records = footer['endian'].decode()
+
+        # New records overwrite the index (re-written when flushing)
+        self.end = int(footer['index'])
+
+        # Read index
+        fid.seek(self.end)
+        index = np.frombuffer(fid.read(count*INDEX_DTYPE.itemsize),INDEX_DTYPE)
+        self.offsets = index['offset'].tolist()
+        self.npts    = index['npts'].tolist()
+        self.ids     = [i.decode() for i in index['id']]
+        self.lookup  = {id: i for i,id in enumerate(self.ids)}
+        # All done
+
+
+    def _footer(self,pos):
+        '''
+        Returns the footer starting at pos if it is consistent with its
+        index (None otherwise)
+        '''
+        if pos < 0:
+            return None
+        self.fid.seek(pos)
+        buf = self.fid.read(FOOTER_DTYPE.itemsize)
+        if len(buf) != FOOTER_DTYPE.itemsize:
+            return None
+        footer = np.frombuffer(buf,FOOTER_DTYPE)[0]
+        if footer['magic'] != ARCHIVE_MAGIC:
+            return None
+        if int(footer['index']) + int(footer['count'])*INDEX_DTYPE.itemsize != pos:
+            return None
+        # All done
+        return footer
+
+
+    def _scanrecords(self,fsize):
+        '''
+        Rebuild the index from the headers of the records (archive without
+        footer, e.g., if appending was interrupted before flushing). 
+        Records are read until the end of the file or until an incomplete
+        record is found.
+        '''
+        fid = self.fid
+        self.endian_records = self.endian
+        o = 0
+        while o + HEADER_SIZE <= fsize:
+            fid.seek(o)
+            hbuf = fid.read(HEADER_SIZE)
+            for endian in (self.endian,'>' if self.endian == '<' else '<'):
+                hdr = np.frombuffer(hbuf,HEADER_DTYPE[endian],1)[0]
+                if hdr['nvhdr'] in (6,7) and 0 <= hdr['npts'] and o + HEADER_SIZE + 4*int(hdr['npts']) <= fsize:
+                    break
+            else: # Incomplete or invalid record
+                break
+            if self.offsets and endian != self.endian_records:
+                break
+            tr = sac()
+            tr._setheader(hdr)
+            self.endian_records = endian
+            self.lookup[tr.id] = len(self.offsets)
+            self.offsets.append(o)
+            self.npts.append(int(tr.npts))
+            self.ids.append(tr.id)
+            o += HEADER_SIZE + 4*int(tr.npts)
+        if o == 0 and fsize > 0:
+            raise SacError('%s is not a sac archive'%(self.filename))
+        self.end = o
+        # All done
+
+
+    def __len__(self):
+        '''
+        Number of traces
+        '''
+        return len(self.offsets)
+
+
+    def __contains__(self,id):
+        '''
+        True if a trace with this id is in the archive
+        '''
+        return id in self.lookup
+
+
+    def __getitem__(self,key):
+        '''
+        Returns a trace by index or by id (see get)
+        '''
+        return self.get(key)
+
+
+    def __iter__(self):
+        '''
+        Iterate over traces
+        '''
+        for i in range(len(self)):
+            yield self.get(i)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self,*exc):
+        self.close()
+        return False
+
+
+    def index(self,key):
+        '''
+        Returns the index of a trace given its index or id
+        (last appended trace with this id)
+        '''
+        if isinstance(key,str):
+            if key not in self.lookup:
+                raise KeyError(key)
+            return self.lookup[key]
+        i = int(key)
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('Trace index out of range')
+        # All done
+        return i
+
+
+    def indices(self,id):
+        '''
+        Returns the indexes of all traces with a given id
+        '''
+        # All done
+        return [i for i,tid in enumerate(self.ids) if tid == id]
+
+
+    def append(self,tr):
+        '''
+        Append a sac object to the archive
+        '''
+        # All done
+        return self._append(tr._tobuffer(),tr.npts,tr.id)
+
+
+    def extend(self,traces):
+        '''
+        Append a list of sac objects to the archive
+        '''
+        for tr in traces:
+            self.append(tr)
+        # All done
+
+
+    def append_file(self,filename):
+        '''
+        Append a sac file to the archive (the file is copied as is
+        if it is in the byte order of the archive)
+        '''
+        with open(filename,'rb') as fid:
+            buf = fid.read()
+        tr = sac()
+        ftype,itype = tr._checkendian(buf[:HEADER_SIZE],len(buf))
+        if ftype[0] != self.endian:
+            tr.read(filename)
+            return self.append(tr)
+        tr._setheader(np.frombuffer(buf,HEADER_DTYPE[self.endian],1)[0])
+        # All done
+        return self._append(buf,tr.npts,tr.id)
+
+
+    def _append(self,buf,npts,id):
+        '''
+        Write a sac record at the end of the records
+        Returns the index of the new trace
+        '''
+        assert self.mode != 'r', 'Archive is opened in read-only mode'
+        bid = id.encode()
+        assert len(bid) <= INDEX_DTYPE['id'].itemsize, 'Trace id is too long (%s)'%(id)
+        if not self.modified: # Remove the index (records remain readable, see _scanrecords)
+            self.fid.truncate(self.end)
+        self.fid.seek(self.end)
+        self.fid.write(buf)
+        self.lookup[id] = len(self.offsets)
+        self.offsets.append(self.end)
+        self.npts.append(int(npts))
+        self.ids.append(id)
+        self.end += len(buf)
+        self.modified = True
+        self._map = None
+        # All done
+        return len(self.offsets)-1
+
+
+    def flush(self):
+        '''
+        Write the index and footer (the archive is then complete on disk)
+        '''
+        if self.mode == 'r' or not self.modified:
+            return
+        index = np.zeros((len(self),),dtype=INDEX_DTYPE)
+        index['offset'] = self.offsets
+        index['npts']   = self.npts
+        index['id']     = [i.encode() for i in self.ids]
+        footer = np.array([(ARCHIVE_MAGIC,ARCHIVE_VERSION,self.endian.encode(),
+                            self.end,len(self))],dtype=FOOTER_DTYPE)
+        self.fid.seek(self.end)
+        self.fid.write(index.tobytes())
+        self.fid.write(footer.tobytes())
+        self.fid.truncate()
+        self.fid.flush()
+        self.endian_records = self.endian
+        self.modified = False
+        self._map = None
+        # All done
+
+
+    def close(self):
+        '''
+        Flush and close the archive
+        '''
+        if self.fid.closed:
+            return
+        self.flush()
+        self.fid.close()
+        self._map = None
+        # All done
+
+
+    def _records(self):
+        '''
+        Returns a read-only memory-map of the archive
+        '''
+        if self._map is None:
+            if self.mode != 'r':
+                self.fid.flush()
+            self._map = np.memmap(self.filename,'uint8','r')
+        # All done
+        return self._map
+
+
+    def tobytes(self,key):
+        '''
+        Returns a trace as the binary content of a standalone sac file
+        '''
+        i = self.index(key)
+        o = self.offsets[i]
+        # All done
+        return self._records()[o:o+HEADER_SIZE+4*self.npts[i]].tobytes()
+
+
+    def extract(self,key,filename):
+        '''
+        Write a trace in a standalone sac file (identical to the archived record)
+        '''
+        buf = self.tobytes(key)
+        with open(filename,'wb') as fid:
+            fid.write(buf)
+        # All done
+
+
+    def get(self,key):
+        '''
+        Returns a trace by index or id as a sac object
+        depvar is a private copy-on-write memory-map of the trace data (data
+        pages are only loaded when accessed and modifications are neither
+        written back to the archive nor seen by other calls to get)
+        Args:
+            * key: trace index or id (last appended trace with this id)
+        '''
+        i = self.index(key)
+        o = self.offsets[i]
+        n = self.npts[i]
+        endian = self.endian_records
+        records = self._records()
+        tr = sac()
+        tr._setheader(records[o:o+HEADER_SIZE].view(HEADER_DTYPE[endian])[0])
+        if n > 0:
+            tr.depvar = np.memmap(self.filename,endian+'f4','c',o+HEADER_SIZE,(n,))
+        tr.e = tr.b + float(tr.npts - 1) * tr.delta
+        # All done
+        return tr
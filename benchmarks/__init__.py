@@ -0,0 +1,10 @@
+'''
+Benchmarks for sacpy I/O and processing methods
+
+Run from the command line using:
+    python -m sacpy.benchmarks --output results.json [--baseline baseline.json]
+(see python -m sacpy.benchmarks --help)
+'''
+
+from .synthetic import synthetic_trace, write_synthetic, synthetic_dataset
+from .suite import CASES, measure, run, compare
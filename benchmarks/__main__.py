@@ -0,0 +1,66 @@
+'''
+Command line interface of the sacpy benchmarks
+'''
+
+import sys
+import json
+import argparse
+
+from .suite import CASES, METHODS, run, compare
+
+
+def main(argv=None):
+    '''
+    Run benchmarks, write JSON results and compare them with a baseline
+    Returns 1 if a case is slower than in the baseline (0 otherwise)
+    '''
+    parser = argparse.ArgumentParser(prog='python -m sacpy.benchmarks',
+                                     description='sacpy benchmarks')
+    parser.add_argument('cases', nargs='*', help='benchmark cases (default: all): '+', '.join(CASES))
+    parser.add_argument('--npts', nargs='+', type=float, default=[1e3,1e5,1e6],
+                        help='numbers of samples (default: 1e3 1e5 1e6)')
+    parser.add_argument('--endian', nargs='+', choices=['le','be'], default=['le','be'],
+                        help='byte orders of sac files (default: le be)')
+    parser.add_argument('--ntraces', nargs='+', type=int, default=[10],
+                        help='numbers of traces for multi-trace cases (default: 10)')
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=list(METHODS),
+                        help='interpolation methods (default: %s)'%(' '.join(METHODS)))
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed calls (default: 5)')
+    parser.add_argument('--no-memory', action='store_true', help='do not measure peak memory')
+    parser.add_argument('--workdir', default='sacpy_bench', help='directory for synthetic files')
+    parser.add_argument('--output', help='output JSON file')
+    parser.add_argument('--baseline', help='baseline JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='time ratio above which a case is reported as slower (default: 1.1)')
+    args = parser.parse_args(argv)
+
+    # Run benchmarks
+    for name in args.cases:
+        if name not in CASES:
+            parser.error('Unknown benchmark case (%s)'%(name))
+    endians = ['<' if e == 'le' else '>' for e in args.endian]
+    results = run(args.cases or None,[int(n) for n in args.npts],endians,args.ntraces,
+                  args.repeat,not args.no_memory,args.workdir,methods=args.methods)
+
+    # Write results
+    if args.output is not None:
+        with open(args.output,'w') as fid:
+            json.dump(results,fid,indent=1,sort_keys=True)
+
+    # Compare with baseline
+    status = 0
+    if args.baseline is not None:
+        with open(args.baseline) as fid:
+            baseline = json.load(fid)
+        print('\n%-50s %12s %12s %8s'%('case','baseline (s)','current (s)','ratio'))
+        for key,t0,t1,ratio,comp in compare(results,baseline,args.threshold):
+            print('%-50s %12.6f %12.6f %8.2f %s'%(key,t0,t1,ratio,comp))
+            if comp == 'slower':
+                status = 1
+
+    # All done
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+'''
+Benchmark cases, timing/peak memory measurements and baseline comparison
+'''
+
+import os
+import sys
+import time
+import platform
+import tracemalloc
+import numpy as np
+import scipy
+
+from ..sac import sac
+from ..sacarray import SacArray
+from ..bulk import read_many
+from .synthetic import synthetic_trace, write_synthetic, synthetic_dataset
+
+
+# Instrument response used by convresp/removeresp cases (STS-2 like)
+PZ = {'zeros': [0j, 0j],
+      'poles': [-0.037+0.037j, -0.037-0.037j, -251.3+0j, -131.0+467.3j, -131.0-467.3j],
+      'Const': 6.0e7}
+
+# Interpolation methods (see sac.interpolate)
+METHODS = ('sinc','wsinc','fft','polyphase')
+
+# 'sinc' interpolation is O(npts^2): larger traces are skipped
+SINC_MAX_NPTS = 30000
+
+
+def measure(func, setup=None, repeat=5, memory=True):
+    '''
+    Measure the execution time and peak memory of func
+    Returns a dictionary including the minimum and median times (in sec)
+    and the peak memory allocated during one call (in MB, from tracemalloc)
+    Args:
+        * func: function to be measured (called with the arguments returned by setup)
+        * setup: function returning a tuple of arguments (not timed)
+        * repeat: number of timed calls
+        * memory: if True, peak memory is measured during an additional call
+    '''
+    times = []
+    for i in range(repeat):
+        args = setup() if setup is not None else ()
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter()-t0)
+
+    # Peak memory (separate call since tracing slows down allocations)
+    peak = None
+    if memory:
+        args = setup() if setup is not None else ()
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]/1.e6
+        tracemalloc.stop()
+
+    # All done
+    return {'time_min': min(times), 'time_median': float(np.median(times)),
+            'peak_mb': peak, 'repeat': repeat}
+
+
+def _trace(npts):
+    '''
+    Setup returning a copy of a synthetic trace
+    '''
+    tr = synthetic_trace(npts)
+    return lambda: (tr.copy(),)
+
+
+def case_read(npts, endian, ntraces, workdir):
+    '''
+    Read a whole sac file
+    '''
+    f = write_synthetic(os.path.join(workdir,'read_%d_%s.sac'%(npts,endian)),npts,endian)
+    return None, lambda: sac(f)
+
+
+def case_read_header(npts, endian, ntraces, workdir):
+    '''
+    Read a sac header
+    '''
+    f = write_synthetic(os.path.join(workdir,'read_%d_%s.sac'%(npts,endian)),npts,endian)
+    return None, lambda: sac().read(f,datflag=False)
+
+
+def case_write(npts, endian, ntraces, workdir):
+    '''
+    Write a sac file
+    '''
+    tr = synthetic_trace(npts)
+    f  = os.path.join(workdir,'write_%d.sac'%(npts))
+    return None, lambda: tr.write(f)
+
+
+def case_read_many(npts, endian, ntraces, workdir):
+    '''
+    Read ntraces sac files (sacpy.read_many)
+    '''
+    files = synthetic_dataset(os.path.join(workdir,'dataset'),ntraces,npts,endian)
+    return None, lambda: read_many(files)
+
+
+def case_decimate(npts, endian, ntraces, workdir):
+    '''
+    Decimation by 4
+    '''
+    return _trace(npts), lambda tr: tr.decimate(4)
+
+
+def case_interpolate(npts, endian, ntraces, workdir, method='wsinc'):
+    '''
+    Interpolation to 1.5*delta with a given method
+    (skipped for 'sinc' if npts > SINC_MAX_NPTS)
+    '''
+    if method == 'sinc' and npts > SINC_MAX_NPTS:
+        return None, None
+    return _trace(npts), lambda tr: tr.interpolate(tr.delta*1.5,method=method)
+
+
+def case_filter(npts, endian, ntraces, workdir):
+    '''
+    Bandpass butterworth filter
+    '''
+    return _trace(npts), lambda tr: tr.filter([0.1,5.],btype='bandpass')
+
+
+def case_fft(npts, endian, ntraces, workdir):
+    '''
+    Fourier transform
+    '''
+    return _trace(npts), lambda tr: tr.fft()
+
+
+def case_convresp(npts, endian, ntraces, workdir):
+    '''
+    Convolution with an instrument response
+    '''
+    return _trace(npts), lambda tr: tr.convresp(PZ)
+
+
+def case_removeresp(npts, endian, ntraces, workdir):
+    '''
+    Instrument response removal
+    '''
+    return _trace(npts), lambda tr: tr.removeresp(PZ,prefilt=(0.01,0.02,10.,20.))
+
+
+def case_add(npts, endian, ntraces, workdir):
+    '''
+    Addition of two sac objects
+    '''
+    tr = synthetic_trace(npts)
+    return None, lambda: tr + tr
+
+
+def case_iadd(npts, endian, ntraces, workdir):
+    '''
+    In-place addition of two sac objects
+    '''
+    tr = synthetic_trace(npts)
+    def iadd():
+        res = tr.copy()
+        res += tr
+    return None, iadd
+
+
+def case_sacarray_filter(npts, endian, ntraces, workdir):
+    '''
+    Bandpass filter of ntraces traces in a SacArray
+    '''
+    arr = SacArray([synthetic_trace(npts,seed=i) for i in range(ntraces)])
+    return lambda: (arr.copy(),), lambda a: a.filter([0.1,5.],btype='bandpass')
+
+
+def case_sacarray_decimate(npts, endian, ntraces, workdir):
+    '''
+    Decimation by 10 of ntraces traces in a SacArray
+    '''
+    arr = SacArray([synthetic_trace(npts,seed=i) for i in range(ntraces)])
+    return lambda: (arr.copy(),), lambda a: a.decimate(10)
+
+
+# Benchmark cases: name: (case function, parameters)
+#  - 'io' cases depend on npts and endian
+#  - 'trace' cases depend on npts
+#  - 'files' cases depend on npts, endian and ntraces
+#  - 'set' cases depend on npts and ntraces
+#  - 'method' cases depend on npts and method
+CASES = {'read':           (case_read,           'io'),
+         'read_header':    (case_read_header,    'io'),
+         'write':          (case_write,          'trace'),
+         'read_many':      (case_read_many,      'files'),
+         'decimate':       (case_decimate,       'trace'),
+         'interpolate':    (case_interpolate,    'method'),
+         'filter':         (case_filter,         'trace'),
+         'fft':            (case_fft,            'trace'),
+         'convresp':       (case_convresp,       'trace'),
+         'removeresp':     (case_removeresp,     'trace'),
+         'add':            (case_add,            'trace'),
+         'iadd':           (case_iadd,           'trace'),
+         'sacarray_filter':(case_sacarray_filter,'set'),
+         'sacarray_decimate':(case_sacarray_decimate,'set')}
+
+
+def run(names=None, npts=(1000,100000,1000000), endians=('<','>'), ntraces=(10,),
+        repeat=5, memory=True, workdir='sacpy_bench', verbose=True, methods=METHODS):
+    '''
+    Run benchmark cases and returns a dictionary of results
+    Args:
+        * names: list of case names (default: all cases, see CASES)
+        * npts: list of numbers of samples
+        * endians: list of byte orders for I/O cases ('<' and/or '>')
+        * ntraces: list of numbers of traces for 'files' and 'set' cases
+        * repeat: number of timed calls per case
+        * memory: if True, measure peak memory
+        * workdir: directory for synthetic files
+        * verbose: if True, print results while running
+        * methods: list of interpolation methods for 'method' cases
+    '''
+    if names is None:
+        names = list(CASES)
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+
+    results = {}
+    for name in names:
+        assert name in CASES, 'Unknown benchmark case (%s)'%(name)
+        case,kind = CASES[name]
+        for n in npts:
+            for endian in (endians if kind in ('io','files') else ('<',)):
+                for m in (ntraces if kind in ('files','set') else (1,)):
+                    for method in (methods if kind == 'method' else (None,)):
+                        args = (int(n),endian,int(m),workdir) + ((method,) if method else ())
+                        setup,func = case(*args)
+                        if func is None:
+                            continue
+                        res = measure(func,setup,repeat,memory)
+                        res.update({'name': name, 'npts': int(n), 'endian': endian, 'ntraces': int(m)})
+                        if method:
+                            res['method'] = method
+                        key = casekey(name,int(n),endian,int(m),kind,method)
+                        results[key] = res
+                        if verbose:
+                            print(formatresult(key,res))
+                            sys.stdout.flush()
+    # All done
+    return {'environment': environment(), 'results': results}
+
+
+def casekey(name, npts, endian, ntraces, kind, method=None):
+    '''
+    Returns the identifier of a benchmark case
+    '''
+    key = '%s[npts=%d'%(name,npts)
+    if kind == 'method':
+        key += ',method=%s'%(method)
+    if kind in ('io','files'):
+        key += ',endian=%s'%('le' if endian == '<' else 'be')
+    if kind in ('files','set'):
+        key += ',ntraces=%d'%(ntraces)
+    # All done
+    return key+']'
+
+
+def formatresult(key, res):
+    '''
+    Returns a line describing a benchmark result
+    '''
+    line = '%-50s %12.6f s'%(key,res['time_min'])
+    if res['peak_mb'] is not None:
+        line += ' %10.1f MB'%(res['peak_mb'])
+    # All done
+    return line
+
+
+def environment():
+    '''
+    Returns a description of the environment
+    '''
+    # All done
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'scipy': scipy.__version__, 'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def compare(results, baseline, threshold=1.1):
+    '''
+    Compare results with a baseline
+    Returns a list of (key, baseline time, time, ratio, status) where status
+    is 'slower' if time/baseline time > threshold, 'faster' if
+    baseline time/time > threshold and 'same' otherwise
+    Args:
+        * results: benchmark results (see run)
+        * baseline: baseline benchmark results
+        * threshold: tolerance on the time ratio
+    '''
+    comparison = []
+    new = results['results']
+    old = baseline['results']
+    for key in new:
+        if key not in old:
+            continue
+        t0 = old[key]['time_min']
+        t1 = new[key]['time_min']
+        ratio = t1/t0 if t0 > 0. else float('inf')
+        if ratio > threshold:
+            status = 'slower'
+        elif ratio < 1./threshold:
+            status = 'faster'
+        else:
+            status = 'same'
+        comparison.append((key,t0,t1,ratio,status))
+    # All done
+    return comparison
@@ -0,0 +1,87 @@
+'''
+Deterministic synthetic sac traces and files used by the benchmarks
+'''
+
+import os
+import sys
+import numpy as np
+
+from ..sac import sac, HEADER_SIZE, HEADER_DTYPE
+
+
+# Number of samples generated at once
+BLOCKSIZE = 2**20
+
+
+def synthetic_trace(npts, delta=0.01, seed=0):
+    '''
+    Returns a sac object filled with a deterministic synthetic waveform
+    (band-limited noise plus a decaying sinusoid)
+    Args:
+        * npts: number of samples
+        * delta: sampling step (in sec)
+        * seed: random seed
+    '''
+    rng = np.random.default_rng(seed)
+    depvar = rng.standard_normal(npts,dtype='float32')
+    tau = 0.2*npts*delta + delta
+    for i in range(0,npts,BLOCKSIZE): # by blocks to limit memory for long traces
+        t = np.arange(i,min(i+BLOCKSIZE,npts))*delta
+        depvar[i:i+BLOCKSIZE] += np.sin(2.*np.pi*0.2*t)*np.exp(-t/tau)
+
+    tr = sac()
+    tr.delta  = np.float32(delta)
+    tr.b      = np.float32(0.)
+    tr.o      = np.float32(0.)
+    tr.npts   = int(npts)
+    tr.depvar = depvar
+    tr.nzyear, tr.nzjday, tr.nzhour = 2020, 1, 0
+    tr.nzmin, tr.nzsec, tr.nzmsec   = 0, 0, 0
+    tr.knetwk = 'XX'
+    tr.kstnm  = 'S%04d'%(seed%10000)
+    tr.khole  = '00'
+    tr.kcmpnm = 'BHZ'
+    tr.id     = tr.knetwk+'_'+tr.kstnm+'_'+tr.khole+'_'+tr.kcmpnm
+    tr.e      = tr.b + float(npts-1)*tr.delta
+    # All done
+    return tr
+
+
+def write_synthetic(filename, npts, endian='<', delta=0.01, seed=0):
+    '''
+    Write a synthetic sac file with a given byte order
+    Args:
+        * filename: output sac file name
+        * npts: number of samples
+        * endian: '<' (little-endian) or '>' (big-endian)
+        * delta: sampling step (in sec)
+        * seed: random seed
+    '''
+    assert endian in ('<','>'), 'endian must be < or >'
+    buf = synthetic_trace(npts,delta,seed).to_bytes()
+    native = '<' if sys.byteorder == 'little' else '>'
+    if endian != native:
+        hdr = np.frombuffer(buf[:HEADER_SIZE],HEADER_DTYPE[native]).astype(HEADER_DTYPE[endian])
+        dat = np.frombuffer(buf[HEADER_SIZE:],native+'f4').astype(endian+'f4')
+        buf = hdr.tobytes() + dat.tobytes()
+    with open(filename,'wb') as fid:
+        fid.write(buf)
+    # All done
+    return filename
+
+
+def synthetic_dataset(directory, ntraces, npts, endian='<', delta=0.01):
+    '''
+    Write ntraces synthetic sac files in directory (if not already there)
+    and returns the list of file names
+    '''
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    files = []
+    for i in range(ntraces):
+        filename = os.path.join(directory,'syn_%d_%s_%05d.sac'%(npts,'le' if endian=='<' else 'be',i))
+        if not os.path.exists(filename):
+            write_synthetic(filename,npts,endian,delta,seed=i)
+        files.append(filename)
+    # All done
+    return files
@@ -0,0 +1,135 @@
+'''
+Parallel reading of many sac files
+'''
+
+import os
+import glob
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .sac import sac
+from .header import read_header
+
+
+def expand(paths_or_glob):
+    '''
+    Returns a list of file names
+    Args:
+        * paths_or_glob: list of file names, directory or glob pattern
+    '''
+    if not isinstance(paths_or_glob,str):
+        return list(paths_or_glob)
+    if os.path.isdir(paths_or_glob):
+        paths_or_glob = os.path.join(paths_or_glob,'*')
+    # All done
+    return sorted(f for f in glob.glob(paths_or_glob) if os.path.isfile(f))
+
+
+def read_one(path, headers_only=False, compact=False, **kwargs):
+    '''
+    Read a single sac file
+    Args:
+        * path: sac file name
+        * headers_only: if True, only read headers
+        * compact: if True and headers_only is True, returns a SacHeader
+                   (compact read-only header, see header.py)
+        * kwargs: other arguments passed to sac.read (e.g., npts, window, ref)
+    '''
+    if headers_only and compact:
+        return read_header(path)
+    tr = sac()
+    tr.read(path,datflag=not headers_only,**kwargs)
+    # All done
+    return tr
+
+
+def iread_many(paths_or_glob, workers=None, executor='thread', headers_only=False,
+               maxpending=None, **kwargs):
+    '''
+    Read sac files in parallel
+    Yields (path, sac object) in input order. If a file cannot be read, the
+    corresponding exception is yielded instead of the sac object.
+    At most maxpending files are read ahead of the consumer.
+    Args:
+        * paths_or_glob: list of file names, directory or glob pattern
+        * workers: number of threads/processes (default: executor default)
+        * executor: 'thread' or 'process'
+        * headers_only: if True, only read headers
+        * maxpending: maximum number of files submitted at once
+                      (default: 4 times the number of workers)
+        * kwargs: other arguments passed to sac.read (e.g., npts, window, ref)
+    '''
+    assert executor in ('thread','process'), 'executor must be thread or process'
+    paths = expand(paths_or_glob)
+
+    # Serial reading
+    if workers == 1:
+        for path in paths:
+            try:
+                yield path, read_one(path,headers_only,**kwargs)
+            except Exception as e:
+                yield path, e
+        return
+
+    # Parallel reading (bounded number of pending files)
+    if executor == 'thread':
+        Executor = ThreadPoolExecutor
+        if workers is None:
+            workers = min(32,(os.cpu_count() or 1)+4)
+    else:
+        Executor = ProcessPoolExecutor
+        if workers is None:
+            workers = os.cpu_count() or 1
+    if maxpending is None:
+        maxpending = 4*workers
+    with Executor(workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path,pool.submit(read_one,path,headers_only,**kwargs)))
+            if len(pending) >= maxpending:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+    # All done
+
+
+def read_many(paths_or_glob, workers=None, executor='thread', headers_only=False,
+              stack=False, **kwargs):
+    '''
+    Read sac files in parallel
+    Returns:
+        * traces: list of sac objects in input order (or a SacArray if stack is True)
+        * errors: list of (path, exception) for files that could not be read
+    Args:
+        * paths_or_glob: list of file names, directory or glob pattern
+        * workers: number of threads/processes (default: executor default)
+        * executor: 'thread' or 'process'
+        * headers_only: if True, only read headers
+        * stack: if True, traces are returned in a SacArray
+        * kwargs: other arguments passed to iread_many, read_one (e.g., compact)
+                  and sac.read
+    '''
+    traces = []
+    errors = []
+    for path,tr in iread_many(paths_or_glob,workers,executor,headers_only,**kwargs):
+        if isinstance(tr,Exception):
+            errors.append((path,tr))
+        else:
+            traces.append(tr)
+    if stack:
+        from .sacarray import SacArray
+        traces = SacArray(traces)
+
+    # All done
+    return traces, errors
+
+
+def _result(path, future):
+    '''
+    Returns (path, sac object) or (path, exception)
+    '''
+    try:
+        return path, future.result()
+    except Exception as e:
+        return path, e
@@ -3,6 +3,9 @@ A simple function to decimate sac files
 '''
 
 import numpy as np
+import scipy.signal as signal
+
+from . import profiling
 
 class FIRfilter(object):
     ''' 
@@ -70,9 +73,12 @@ class ChannelSegment(object):
 
 
 
+@profiling.timed('decimate.decimate')
 def decimate(yi, FIR, dec_fac):
     '''
     Decimate yi by dec_fac using FIR filter
+    (polyphase implementation: only the output samples are computed)
+    yi can be a 2-D array, in which case each row is decimated
     '''
     
     if dec_fac == 1:
@@ -80,29 +86,194 @@ def decimate(yi, FIR, dec_fac):
 
     # Length of filter
     N = FIR.n1 + FIR.n2
-    n = len(yi)
+    n = np.shape(yi)[-1]
+    nout = (n + dec_fac - 1)//dec_fac
     
-    # Channel Segment
-    chan = ChannelSegment(N,[FIR.n2,N],yi)
-
-    # Main loop
-    j = 0
-    yo = []
-    for i in range(FIR.n1,n+FIR.n1):
-        if i<n:
-            chan.push_back(yi[i])
-        else:
-            chan.push_back()
-        if (chan.counter >= 0) and (chan.counter % dec_fac == 0):
-            yo.append(chan.dot(FIR.coeffs))
-            j += 1
-        chan.counter += 1
-    yo = np.array(yo)
+    # Zero padded input (filter centered on each output sample)
+    x = np.zeros(np.shape(yi)[:-1]+(n+N,),dtype='float32')
+    x[...,FIR.n2-1:FIR.n2-1+n] = yi
+
+    # Filtering
+    yo = polyphase(x,FIR.coeffs,dec_fac,nout)
     
-    # All Done
+    # All done
     return yo
 
 
+def polyphase(x, coeffs, dec_fac, nout):
+    '''
+    Computes nout output samples yo[k] = sum_j coeffs[j]*x[k*dec_fac+j]
+    as a sum over the dec_fac polyphase components
+    Args:
+        * x: input samples (at least (nout-1)*dec_fac+len(coeffs) samples),
+             1-D array or 2-D array (filtering along the last axis)
+        * coeffs: FIR coefficients
+        * dec_fac: decimation factor
+        * nout: number of output samples
+    '''
+    yo = np.zeros(x.shape[:-1]+(nout,),dtype='float32')
+    if nout == 0:
+        return yo
+    if x.ndim == 1:
+        for r in range(dec_fac):
+            yo += np.correlate(x[r::dec_fac],coeffs[r::dec_fac],'valid')[:nout]
+    else:
+        # Per-phase correlation of each row
+        for i in np.ndindex(x.shape[:-1]):
+            yo[i] = polyphase(x[i],coeffs,dec_fac,nout)
+
+    # All done
+    return yo
+
+
+def designfir(dec_fac):
+    '''
+    Design an anti-aliasing FIR filter for decimation by dec_fac
+    (equiripple low-pass filter, pass band up to 0.9 times the new Nyquist frequency)
+    Returns the first half of FIR coefficients (can be used in FIRfilter)
+    The number of taps grows with dec_fac and the design becomes very slow
+    for large factors (stages larger than MAX_STAGE are rejected)
+    '''
+    if dec_fac > MAX_STAGE:
+        raise ValueError('Decimation stage by %d is too large (prime factors must be <= %d), '
+                         'use sac.interpolate to resample the data'%(dec_fac,MAX_STAGE))
+    ntaps  = 44*dec_fac + 7
+    coeffs = signal.remez(ntaps,[0.,0.45/dec_fac,0.5/dec_fac,0.5],[1.,0.],
+                          weight=[1.,4.],fs=1.)
+    # All done
+    return coeffs[:ntaps//2+1]
+
+
+def getfir(dec_fac):
+    '''
+    Returns the FIR filter used for a decimation stage by dec_fac
+    (filters are built once and cached in FIRBANK)
+    '''
+    if dec_fac not in FIRBANK:
+        if dec_fac in FIRDEC:
+            coeffs = FIRDEC[dec_fac]
+        else:
+            coeffs = designfir(dec_fac)
+        FIRBANK[dec_fac] = FIRfilter(coeffs)
+    # All done
+    return FIRBANK[dec_fac]
+
+
+def plan(dec_fac):
+    '''
+    Returns the cascade of decimation stages for any integer factor dec_fac
+    (prime factors with 2*2 merged into 4, largest stages first)
+    '''
+    assert int(dec_fac) == dec_fac and dec_fac >= 1, 'Incorrect decimation factor'
+    dec_fac = int(dec_fac)
+    if dec_fac in FACS:
+        return [c for c in FACS[dec_fac] if c > 1]
+    
+    # Prime factors
+    stages = []
+    p = 2
+    while p*p <= dec_fac:
+        while dec_fac % p == 0:
+            stages.append(p)
+            dec_fac //= p
+        p += 1
+    if dec_fac > 1:
+        stages.append(dec_fac)
+    
+    # Merge pairs of 2 into 4
+    n2 = stages.count(2)
+    stages = [c for c in stages if c != 2] + [4]*(n2//2) + [2]*(n2%2)
+    
+    # All done
+    return sorted(stages,reverse=True)
+
+
+def cascade(yi, dec_fac):
+    '''
+    Decimate yi by dec_fac using a cascade of FIR filters
+    '''
+    for c in plan(dec_fac):
+        yi = decimate(yi, getfir(c), c)
+    # All done
+    return yi
+
+
+class StreamingDecimator(object):
+    '''
+    Decimation of a continuous stream of data chunks
+    The filter history of each stage is kept between chunks, so that the
+    concatenated outputs of push() and flush() are identical to
+    cascade() applied to the concatenated chunks.
+    '''
+
+    def __init__(self,dec_fac):
+        '''
+        Args:
+            * dec_fac: decimation factor (any positive integer)
+        '''
+        self.dec_fac = dec_fac
+        self.stages  = plan(dec_fac)
+        self.firs    = [getfir(c) for c in self.stages]
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset the filter history (start a new stream)
+        '''
+        self.buffers = [np.zeros((fir.n2-1,),dtype='float32') for fir in self.firs]
+        self.nin     = [0 for c in self.stages]
+        self.nout    = [0 for c in self.stages]
+
+    def push(self,yi):
+        '''
+        Decimate a new chunk of data
+        Returns the output samples that can be computed so far
+        '''
+        for i in range(len(self.stages)):
+            yi = self._stage(i,yi)
+        # All done
+        return yi
+
+    def flush(self):
+        '''
+        End of stream: returns the remaining output samples (assuming zeros 
+        after the last chunk) and reset the filter history
+        '''
+        yo = np.zeros((0,),dtype='float32')
+        for i in range(len(self.stages)):
+            yo = self._stage(i,yo,last=True)
+        self.reset()
+        # All done
+        return yo
+
+    def _stage(self,i,yi,last=False):
+        '''
+        Push yi through stage i
+        '''
+        fir = self.firs[i]
+        dec = self.stages[i]
+        N   = fir.n1 + fir.n2
+
+        # Append new samples to the filter history
+        self.nin[i] += len(yi)
+        buf = np.concatenate((self.buffers[i],np.asarray(yi,dtype='float32')))
+
+        # Number of output samples that can be computed
+        if last:
+            buf  = np.concatenate((buf,np.zeros((N,),dtype='float32')))
+            nout = (self.nin[i]+dec-1)//dec - self.nout[i]
+        else:
+            nout = max((len(buf)-N)//dec+1,0)
+
+        # Filtering
+        yo = polyphase(buf,fir.coeffs,dec,nout)
+        self.nout[i]   += nout
+        self.buffers[i] = buf[nout*dec:].copy()
+
+        # All done
+        return yo
+
+
 FACS = {120: [5,4,3,2],
         100: [5,5,4,1],
         90: [5,3,3,2],
@@ -226,3 +397,16 @@ FIRDEC5 = [0.22739838E-02, 0.92948624E-03, 0.76842657E-03,
            -0.39482988E-01, -0.38539425E-01, -0.21801252E-01,
            0.10695269E-01, 0.54943368E-01, 0.10361496E+00,
            0.14762825E+00, 0.17825589E+00, 0.18922436E+00]
+
+
+FIRDEC = {2: FIRDEC2,
+          3: FIRDEC3,
+          4: FIRDEC4,
+          5: FIRDEC5}
+
+# Largest decimation stage for which a FIR filter is designed 
+# (4451 taps, about 0.5 s with remez)
+MAX_STAGE = 101
+
+# Cache of FIR filters (see getfir)
+FIRBANK = {}
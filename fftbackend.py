@@ -0,0 +1,89 @@
+'''
+FFT backend used by sac.fft, sac.ifft, the response engine (convresp,
+removeresp) and the corresponding SacArray methods
+
+Available backends:
+    * 'scipy': scipy.fft (default). Single precision inputs are transformed
+               in single precision. With workers > 1, independent transforms
+               of 2-D arrays (e.g., SacArray traces) are computed in parallel.
+    * 'numpy': numpy.fft (single-threaded, workers is ignored).
+    * 'pyfftw': pyfftw.interfaces.scipy_fft (optional dependency). FFTW plans
+                are kept for repeated transform sizes and single transforms
+                are also computed with several threads.
+'''
+
+import os
+import numpy as np
+import scipy.fft
+
+
+# Current backend (see set_fft_backend)
+BACKEND = {'name': 'scipy', 'module': scipy.fft, 'workers': -1}
+
+
+def set_fft_backend(name='scipy', workers=-1):
+    '''
+    Select the FFT backend
+    Args:
+        * name: 'scipy', 'numpy' or 'pyfftw'
+        * workers: number of threads (-1: number of CPUs)
+    '''
+    assert name in ('scipy','numpy','pyfftw'), 'Unknown FFT backend (%s)'%(name)
+    if name == 'scipy':
+        module = scipy.fft
+    elif name == 'numpy':
+        module = np.fft
+    else:
+        import pyfftw
+        import pyfftw.interfaces.scipy_fft as module
+        pyfftw.interfaces.cache.enable() # Re-use plans for repeated sizes
+        pyfftw.interfaces.cache.set_keepalive_time(60.)
+    BACKEND['name']    = name
+    BACKEND['module']  = module
+    BACKEND['workers'] = workers
+    # All done
+
+
+def get_fft_backend():
+    '''
+    Returns the name of the current backend and the number of workers
+    '''
+    # All done
+    return BACKEND['name'], BACKEND['workers']
+
+
+def _kwargs():
+    '''
+    Backend specific keyword arguments
+    '''
+    if BACKEND['name'] == 'numpy':
+        return {}
+    workers = BACKEND['workers']
+    if workers is not None and workers < 0:
+        workers = os.cpu_count() or 1
+    # All done
+    return {'workers': workers}
+
+
+def rfft(x, n=None, axis=-1):
+    '''
+    Real-to-complex FFT along axis (see numpy.fft.rfft)
+    '''
+    # All done
+    return BACKEND['module'].rfft(x, n, axis=axis, **_kwargs())
+
+
+def irfft(x, n=None, axis=-1):
+    '''
+    Complex-to-real inverse FFT along axis (see numpy.fft.irfft)
+    '''
+    # All done
+    return BACKEND['module'].irfft(x, n, axis=axis, **_kwargs())
+
+
+def next_fast_len(n):
+    '''
+    Returns the smallest fast length larger than or equal to n for real transforms
+    '''
+    # All done
+    return scipy.fft.next_fast_len(n, real=True)
@@ -0,0 +1,79 @@
+'''
+Butterworth filter design cache and streaming filter used by sac.filter
+'''
+
+import numpy as np
+import scipy.signal as signal
+from functools import lru_cache
+
+from . import profiling
+
+
+def butter(freq, delta, order=4, btype='lowpass', dtype='float64'):
+    '''
+    Returns the second-order sections of a butterworth filter
+    (designs are cached, see butter_sos)
+    Args:
+        * freq: A scalar or length-2 sequence giving the critical frequencies (in Hz)
+        * delta: sampling step (in sec)
+        * order:  Order of the filter.
+        * btype: {'lowpass', 'highpass', 'bandpass', 'bandstop'}
+        * dtype: 'float64' or 'float32' (filtering is done in that precision)
+    '''
+    if type(freq) is list:
+        freq = np.array(freq)
+    Wn = freq * 2. * delta # Normalizing frequencies
+    Wn = tuple(float(w) for w in np.atleast_1d(Wn))
+    # All done
+    return butter_sos(order, Wn, btype, str(dtype))
+
+
+@lru_cache(maxsize=256)
+@profiling.timed('filters.butter_design')
+def butter_sos(order, Wn, btype, dtype='float64'):
+    '''
+    Cached butterworth filter design
+    Args:
+        * order:  Order of the filter.
+        * Wn: tuple of normalized critical frequencies
+        * btype: {'lowpass', 'highpass', 'bandpass', 'bandstop'}
+        * dtype: dtype of the second-order sections
+    '''
+    if len(Wn) == 1:
+        Wn = Wn[0]
+    sos = signal.butter(order, Wn, btype, output='sos').astype(dtype) # shared between calls (not to be modified)
+    # All done
+    return sos
+
+
+class StreamingFilter(object):
+    '''
+    Butterworth filter applied to a continuous stream of data chunks
+    The filter state is kept between chunks, so that the concatenated outputs
+    are identical to the filtering of the concatenated chunks.
+    '''
+
+    def __init__(self, freq, delta, order=4, btype='lowpass'):
+        '''
+        Args:
+            * freq: A scalar or length-2 sequence giving the critical frequencies (in Hz)
+            * delta: sampling step (in sec)
+            * order:  Order of the filter.
+            * btype: {'lowpass', 'highpass', 'bandpass', 'bandstop'}
+        '''
+        self.sos = butter(freq, delta, order, btype)
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset the filter state (start a new stream)
+        '''
+        self.zi = np.zeros((self.sos.shape[0],2))
+
+    def push(self, yi):
+        '''
+        Filter a new chunk of data
+        '''
+        yo, self.zi = signal.sosfilt(self.sos, yi, zi=self.zi)
+        # All done
+        return yo.astype('float32')
@@ -0,0 +1,118 @@
+'''
+Compact header-only representation of sac files
+
+A SacHeader keeps the raw 632-byte header and decodes header variables
+when they are accessed, which takes about seven times less memory than a sac
+object read with datflag=False (useful to hold catalogs of millions of
+headers in memory).
+'''
+
+import os
+import numpy as np
+
+from .sac import sac, checkendian, unpack_c, HEADER_SIZE, HEADER_DTYPE, HEADER_CHARS
+
+
+# Header variables: name: (offset, numpy type, number of values)
+FIELDS = {name: (off, dt.base.str[1:], dt.shape[0] if dt.shape else 1)
+          for name,(dt,off) in HEADER_DTYPE['<'].fields.items() if name[0] != '_'}
+CHARS  = {name: l for name,l,n in HEADER_CHARS}
+
+
+class SacHeader(object):
+    '''
+    Read-only sac header decoded on access
+    Header variables are accessed as for sac objects (e.g., hdr.b,
+    hdr.kstnm, hdr.id). Use to_sac() to get a full sac object.
+    '''
+
+    __slots__ = ('buf','endian','filename')
+
+    def __init__(self,buf,endian='<',filename=None):
+        '''
+        Args:
+            * buf: 632-byte sac header (bytes)
+            * endian: byte order of the header ('<' or '>')
+            * filename: sac file name (optional, used to read data in to_sac)
+        '''
+        assert len(buf) == HEADER_SIZE, 'A sac header must include 632 bytes'
+        self.buf      = bytes(buf)
+        self.endian   = endian
+        self.filename = filename
+
+
+    def __getattr__(self,name):
+        '''
+        Decode a header variable
+        '''
+        if name in FIELDS:
+            off,typ,n = FIELDS[name]
+            if typ[0] == 'V': # characters
+                l = CHARS[name]
+                v = self.buf[off:off+l*n]
+                if n > 1:
+                    return [unpack_c(v[i:i+l]) for i in range(0,n*l,l)]
+                v = unpack_c(v,name!='kevnm')
+                if name == 'khole' and (v=='' or v=='-12345'):
+                    v = '--'
+                return v
+            v = np.frombuffer(self.buf,self.endian+typ,n,off)
+            if n > 1:
+                return v.astype(typ)
+            if name == 'e': # end time is re-assigned as in sac.read
+                return self.b + float(self.npts-1) * self.delta
+            return v[0]
+        if name == 'id':
+            return self.knetwk+'_'+self.kstnm+'_'+self.khole+'_'+self.kcmpnm
+        raise AttributeError(name)
+
+
+    def __repr__(self):
+        return 'SacHeader(%s, npts=%d, delta=%g)'%(self.id,self.npts,self.delta)
+
+
+    def __getstate__(self):
+        return (self.buf,self.endian,self.filename)
+
+
+    def __setstate__(self,state):
+        self.buf,self.endian,self.filename = state
+
+
+    def tobytes(self):
+        '''
+        Returns the raw header
+        '''
+        # All done
+        return self.buf
+
+
+    def to_sac(self,datflag=False):
+        '''
+        Returns a sac object
+        Args:
+            * datflag: if True, data points are read from self.filename
+        '''
+        tr = sac()
+        if datflag:
+            assert self.filename is not None, 'No sac file associated with the header'
+            tr.read(self.filename)
+        else:
+            tr._setheader(np.frombuffer(self.buf,HEADER_DTYPE[self.endian],1)[0])
+        # All done
+        return tr
+
+
+def read_header(FILE):
+    '''
+    Read the header of a sac file
+    Returns a SacHeader object
+    Args:
+        * FILE: sac file name
+    '''
+    with open(FILE,'rb') as fid:
+        buf   = fid.read(HEADER_SIZE)
+        fsize = os.fstat(fid.fileno()).st_size
+    ftype,itype = checkendian(buf,fsize)
+    # All done
+    return SacHeader(buf,ftype[0],FILE)
@@ -0,0 +1,104 @@
+'''
+Merge sac segments into continuous traces
+'''
+
+from collections import OrderedDict
+import numpy as np
+
+from . import profiling
+
+
+GAP_FILLS = ('zeros','nan','interpolate')
+OVERLAPS  = ('last','first','error')
+
+
+@profiling.timed('merge.merge')
+def merge(traces,fill='zeros',overlap='last'):
+    '''
+    Merge segments with the same id into continuous traces
+    Segments are sorted by absolute start time (getnzdatetime() + b) and
+    copied once in a preallocated output array. Start times are rounded
+    to the nearest sample of the first segment.
+    Returns a list of sac objects (one per id, in order of first appearance).
+    The header of each merged trace is the header of its first segment
+    (with updated npts and e).
+    Args:
+        * traces: list of sac objects (time-domain, same delta for a given id)
+        * fill: gap filling method
+            - 'zeros': gaps are filled with zeros
+            - 'nan': gaps are filled with NaNs
+            - 'interpolate': linear interpolation between samples around gaps
+        * overlap: overlap policy
+            - 'last': samples of the latest segment are kept
+            - 'first': samples of the earliest segment are kept
+            - 'error': raise a ValueError if segments are overlapping
+    '''
+    assert fill in GAP_FILLS, 'fill must be one of %s'%(', '.join(GAP_FILLS))
+    assert overlap in OVERLAPS, 'overlap must be one of %s'%(', '.join(OVERLAPS))
+
+    # Group segments by id
+    groups = OrderedDict()
+    for tr in traces:
+        assert not tr.spec, 'Can only merge seismograms in the time-domain'
+        groups.setdefault(tr.id,[]).append(tr)
+
+    # All done
+    return [_merge(segments,fill,overlap) for segments in groups.values()]
+
+
+def _merge(segments,fill,overlap):
+    '''
+    Merge segments with the same id (see merge)
+    '''
+    # Sort segments by start time relative to the reference time of the first segment
+    segments = [tr for tr in segments if tr.npts > 0] or segments[:1]
+    nztime = segments[0].getnzdatetime()
+    starts = [(tr.getnzdatetime()-nztime).total_seconds() + float(tr.b) for tr in segments]
+    order  = np.argsort(starts,kind='stable')
+    tr0    = segments[order[0]]
+    delta  = float(tr0.delta)
+    for tr in segments:
+        assert np.isclose(tr.delta,delta,rtol=1e-5), 'Header field mismatch: delta (%s)'%(tr.id)
+
+    # Sample offsets
+    offsets = [int(round((starts[i] - starts[order[0]])/delta)) for i in order]
+    npts    = max(o + segments[i].npts for o,i in zip(offsets,order))
+    dtype   = np.result_type(*[segments[i].depvar.dtype for i in order])
+
+    # Copy segments in the output array
+    out  = np.empty((npts,),dtype=dtype)
+    gaps = []
+    end  = 0 # end of the data copied so far (all samples before end are assigned)
+    for o,i in zip(offsets,order):
+        tr = segments[i]
+        if o > end:
+            gaps.append((end,o))
+        elif o < end:
+            if overlap == 'error':
+                raise ValueError('Overlapping segments (%s, %d samples)'%(tr.id,end-o))
+            if overlap == 'first':
+                if o + tr.npts > end:
+                    out[end:o+tr.npts] = tr.depvar[end-o:]
+                end = max(end,o+tr.npts)
+                continue
+        out[o:o+tr.npts] = tr.depvar
+        end = max(end,o+tr.npts)
+
+    # Fill gaps
+    for g1,g2 in gaps:
+        if fill == 'zeros':
+            out[g1:g2] = 0.
+        elif fill == 'nan':
+            out[g1:g2] = np.nan
+        else:
+            x = np.arange(1,g2-g1+1,dtype='float64')/(g2-g1+1)
+            out[g1:g2] = out[g1-1] + x*(float(out[g2])-float(out[g1-1]))
+
+    # Merged trace
+    res = tr0.copy(data=False)
+    res.depvar = out
+    res.npts   = npts
+    res.e      = res.b + float(npts - 1) * res.delta
+
+    # All done
+    return res
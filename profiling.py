@@ -0,0 +1,197 @@
+'''
+Opt-in instrumentation of sacpy methods
+
+When enabled, instrumented functions (sac methods, decimate.decimate,
+filters.butter, resample.resample, ...) record their number of calls,
+cumulative wall time, bytes read/written and the size of the data arrays
+they allocate. Use:
+    sacpy.profiling.enable()
+    ...
+    print(sacpy.profiling.report(sacpy.stats()))
+or, for a scoped measurement:
+    with sacpy.profile() as prof:
+        ...
+    prof.stats
+When disabled (default), instrumented functions only check a flag.
+Calls made in other processes (e.g., read_many with executor='process')
+are not recorded.
+'''
+
+import time
+import threading
+import functools
+import numpy as np
+from copy import deepcopy
+
+
+# Instrumentation state
+STATE = {'enabled': False}
+
+# Timing registry: name: counters
+REGISTRY = {}
+COUNTERS = ('calls','time','bytes_read','bytes_written','bytes_allocated')
+LOCK = threading.Lock()
+
+
+def enable():
+    '''
+    Enable instrumentation
+    '''
+    STATE['enabled'] = True
+    # All done
+
+
+def disable():
+    '''
+    Disable instrumentation
+    '''
+    STATE['enabled'] = False
+    # All done
+
+
+def isenabled():
+    '''
+    Returns True if instrumentation is enabled
+    '''
+    # All done
+    return STATE['enabled']
+
+
+def reset():
+    '''
+    Clear the timing registry
+    '''
+    with LOCK:
+        REGISTRY.clear()
+    # All done
+
+
+def stats():
+    '''
+    Returns a snapshot of the timing registry
+    (dictionary name: {'calls', 'time', 'bytes_read', 'bytes_written', 'bytes_allocated'})
+    '''
+    with LOCK:
+        snapshot = deepcopy(REGISTRY)
+    # All done
+    return snapshot
+
+
+def record(name, **counters):
+    '''
+    Add counters (calls, time, bytes_read, ...) to the entry name of the
+    registry (does nothing if instrumentation is disabled)
+    '''
+    if not STATE['enabled']:
+        return
+    with LOCK:
+        entry = REGISTRY.get(name)
+        if entry is None:
+            entry = REGISTRY[name] = dict.fromkeys(COUNTERS,0)
+        for k,v in counters.items():
+            entry[k] += v
+    # All done
+
+
+def timed(name):
+    '''
+    Decorator recording calls, wall time and allocated data arrays of a
+    function in the entry name of the registry. For methods, the size
+    of self.depvar is recorded if it is re-assigned, as well as the size
+    of the data of returned sac objects or arrays.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not STATE['enabled']:
+                return func(*args, **kwargs)
+            before = _depvar(args[0]) if args else None
+            t0 = time.perf_counter()
+            out = func(*args, **kwargs)
+            dt = time.perf_counter() - t0
+            nbytes = _nbytes(out)
+            if args and before is not None:
+                after = _depvar(args[0])
+                if after is not before and not np.may_share_memory(after,before):
+                    nbytes += _nbytes(after)
+            record(name, calls=1, time=dt, bytes_allocated=nbytes)
+            # All done
+            return out
+        return wrapper
+    # All done
+    return decorator
+
+
+class profile(object):
+    '''
+    Context manager enabling instrumentation in a scope
+    The counters recorded within the scope are in self.stats on exit.
+    '''
+
+    def __enter__(self):
+        self.enabled = STATE['enabled']
+        self.start = stats()
+        self.stats = {}
+        enable()
+        return self
+
+    def __exit__(self, *exc):
+        if not self.enabled:
+            disable()
+        self.stats = diff(stats(),self.start)
+        # All done
+        return False
+
+
+def diff(end, start):
+    '''
+    Returns the counters recorded between two snapshots
+    '''
+    out = {}
+    for name,entry in end.items():
+        entry0 = start.get(name,{})
+        delta  = {k: v - entry0.get(k,0) for k,v in entry.items()}
+        if delta['calls'] or delta['bytes_read'] or delta['bytes_written']:
+            out[name] = delta
+    # All done
+    return out
+
+
+def report(snapshot=None):
+    '''
+    Returns a table of counters sorted by cumulative time
+    Args:
+        * snapshot: registry snapshot (default: current registry)
+    '''
+    if snapshot is None:
+        snapshot = stats()
+    lines = ['%-28s %8s %12s %12s %12s %12s'%('name','calls','time (s)','read (MB)',
+                                              'written (MB)','alloc (MB)')]
+    for name,e in sorted(snapshot.items(),key=lambda x: -x[1]['time']):
+        lines.append('%-28s %8d %12.6f %12.3f %12.3f %12.3f'%(name,e['calls'],e['time'],
+                     e['bytes_read']/1.e6,e['bytes_written']/1.e6,e['bytes_allocated']/1.e6))
+    # All done
+    return '\n'.join(lines)
+
+
+def _depvar(obj):
+    '''
+    Returns the data array of obj if it exists (None otherwise)
+    (stored array, i.e., without triggering a deferred byteswap)
+    '''
+    d = getattr(obj,'__dict__',None)
+    if d is None:
+        return None
+    # All done
+    return d.get('_depvar',d.get('depvar'))
+
+
+def _nbytes(out):
+    '''
+    Returns the size of an output array or of the data of an output sac object
+    '''
+    nbytes = getattr(out,'nbytes',None)
+    if nbytes is None:
+        nbytes = getattr(_depvar(out),'nbytes',0)
+    # All done
+    return nbytes
@@ -0,0 +1,169 @@
+'''
+Resampling functions used by sac.interpolate
+
+Available methods (accuracy/speed trade-off):
+    * 'sinc': sinc interpolation using all input samples for each output
+              sample (original sacpy method). O(npts*npts_new), only
+              practical for short traces.
+    * 'wsinc': Kaiser-windowed sinc interpolation using 2*hw input samples
+               around each output sample. O(npts_new*hw), works for any
+               sampling step. Same result as 'sinc' within 2-4e-4 (relative
+               to the peak amplitude) for signals below 0.8 times the 
+               Nyquist frequency (hw=16).
+    * 'fft': Fourier interpolation (zero padding/truncation of the
+             spectrum of the zero-padded trace). O(n log n), exact for
+             band-limited signals but sensitive to edge effects.
+    * 'polyphase': rational-ratio resampling with a polyphase anti-aliasing
+                   FIR filter (scipy.signal.resample_poly). O(npts*up), the
+                   fastest method when delta/delta_new = up/down is a ratio
+                   of small integers.
+'fft' and 'polyphase' require delta/delta_new to be a rational number
+(denominator <= 1000). 'sinc' and 'wsinc' do not include any anti-aliasing
+filter when delta_new > delta, while 'fft' and 'polyphase' remove
+frequencies above the new Nyquist frequency.
+'''
+
+import numpy as np
+import scipy.signal as signal
+import scipy.special as special
+from fractions import Fraction
+from functools import lru_cache
+
+from . import profiling
+
+
+# Maximum size of temporary arrays (number of elements)
+BLOCKSIZE = 2**21
+
+
+@profiling.timed('resample.resample')
+def resample(yi, delta, delta_new, npts_new, method='wsinc', **kwargs):
+    '''
+    Resample yi from sampling step delta to delta_new
+    Args:
+        * yi: input samples (first sample at t=0)
+        * delta: input sampling step
+        * delta_new: output sampling step
+        * npts_new: number of output samples
+        * method: 'wsinc', 'sinc', 'fft' or 'polyphase'
+        * kwargs: method specific arguments
+    '''
+    assert method in METHODS, 'Incorrect resampling method (%s)'%(method)
+    # All done
+    return METHODS[method](yi, delta, delta_new, npts_new, **kwargs)
+
+
+def sinc(yi, delta, delta_new, npts_new):
+    '''
+    Sinc interpolation using all input samples for each output sample
+    '''
+    n = len(yi)
+    time_old = np.arange(n,dtype='float32')*delta   # Time vector before interpolation
+    time_new = np.arange(npts_new,dtype='float32')*delta_new # Time vector after interpolation
+
+    # Sinc interpolation (by blocks of output samples)
+    yo = np.zeros((npts_new,),dtype='float32')
+    nb = max(BLOCKSIZE//max(n,1),1)
+    for i in range(0,npts_new,nb):
+        k = np.sinc((time_new[i:i+nb,None]-time_old[None,:])/delta)
+        yo[i:i+nb] = k.dot(yi)
+
+    # All done
+    return yo
+
+
+def wsinc(yi, delta, delta_new, npts_new, hw=16, beta=8.):
+    '''
+    Kaiser-windowed sinc interpolation
+    Args:
+        * hw: half-width of the interpolation kernel (in input samples)
+        * beta: shape parameter of the Kaiser window
+    '''
+    n = len(yi)
+    table = wsinc_table(hw, beta)
+    K = table.shape[0] - 2
+
+    # Zero padded input
+    yp = np.zeros((n+2*hw+1,),dtype='float32')
+    yp[hw:hw+n] = yi
+
+    # Interpolation (by blocks of output samples)
+    yo = np.zeros((npts_new,),dtype='float32')
+    j  = np.arange(-hw+1,hw+1)
+    nb = max(BLOCKSIZE//(2*hw),1)
+    for i in range(0,npts_new,nb):
+        t  = np.arange(i,min(i+nb,npts_new))*(float(delta_new)/float(delta))
+        i0 = np.floor(t).astype(int)
+        # Kernel weights (linear interpolation in the kernel table)
+        f  = (t-i0)*K
+        r  = f.astype(int)
+        a  = (f-r).astype('float32')[:,None]
+        w  = table[r]*(1.-a) + table[r+1]*a
+        # Weighted sum of input samples
+        idx = np.clip(i0[:,None] + j[None,:] + hw, 0, n+2*hw)
+        yo[i:i+nb] = (w*yp[idx]).sum(axis=1)
+
+    # All done
+    return yo
+
+
+@lru_cache(maxsize=None)
+def wsinc_table(hw, beta, K=512):
+    '''
+    Returns the windowed sinc kernel tabulated at fractional sample 
+    positions k/K, k=0,...,K+1 (row k gives the weights of the 2*hw input 
+    samples for an output sample at k/K input samples after a grid point)
+    '''
+    frac = np.arange(K+2)/float(K)
+    x = frac[:,None] - np.arange(-hw+1,hw+1)[None,:]
+    w = np.sinc(x)*special.i0(beta*np.sqrt(np.clip(1.-(x/hw)**2,0.,None)))
+    w /= special.i0(beta)
+    # All done
+    return w.astype('float32')
+
+
+def fft(yi, delta, delta_new, npts_new):
+    '''
+    Fourier interpolation of the zero-padded trace
+    '''
+    up,down = ratio(delta, delta_new)
+    n = len(yi)
+
+    # Zero padding to a multiple of down (at least twice the trace length)
+    L  = down*int(np.ceil(2.*n/down))
+    yp = np.zeros((L,),dtype='float32')
+    yp[:n] = yi
+
+    # Fourier interpolation
+    yo = signal.resample(yp, L*up//down)[:npts_new]
+
+    # All done
+    return yo.astype('float32')
+
+
+def polyphase(yi, delta, delta_new, npts_new):
+    '''
+    Rational-ratio polyphase resampling
+    '''
+    up,down = ratio(delta, delta_new)
+    yo = signal.resample_poly(yi, up, down)[:npts_new]
+
+    # All done
+    return yo.astype('float32')
+
+
+def ratio(delta, delta_new, maxden=1000):
+    '''
+    Returns up and down such that delta/delta_new = up/down
+    '''
+    r = Fraction(float(delta)/float(delta_new)).limit_denominator(maxden)
+    assert abs(float(r)*float(delta_new)/float(delta)-1.) < 1e-5, \
+        'delta/delta_new must be a rational number (use wsinc or sinc method)'
+    # All done
+    return r.numerator, r.denominator
+
+
+METHODS = {'sinc': sinc,
+           'wsinc': wsinc,
+           'fft': fft,
+           'polyphase': polyphase}
@@ -0,0 +1,238 @@
+'''
+Instrument response convolution/deconvolution engine used by sac.convresp,
+sac.removeresp and the corresponding SacArray methods
+
+Traces are zero padded to a fast FFT length (next 5-smooth length of at
+least twice the trace length) and evaluated responses are cached (keyed by
+poles, zeros, constant, nfft and delta), so that processing many traces
+recorded by the same instrument type costs a single response evaluation.
+The cache is bounded in bytes (see set_cache_size and clear_cache).
+'''
+
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from .sac import pzresp, get_dtypes
+from . import fftbackend
+from . import profiling
+
+
+# Cache of evaluated responses: key: read-only array (least recently used first)
+CACHE = {'maxbytes': 256*2**20, 'nbytes': 0, 'entries': OrderedDict()}
+LOCK  = threading.Lock()
+
+
+def set_cache_size(maxbytes):
+    '''
+    Set the maximum size of the response cache
+    Args:
+        * maxbytes: maximum size in bytes (default: 256 MB, 0: no cache)
+    '''
+    assert maxbytes >= 0, 'maxbytes must be positive'
+    with LOCK:
+        CACHE['maxbytes'] = int(maxbytes)
+        entries = CACHE['entries']
+        while CACHE['nbytes'] > CACHE['maxbytes']:
+            k,v = entries.popitem(last=False)
+            CACHE['nbytes'] -= v.nbytes
+    # All done
+
+
+def clear_cache():
+    '''
+    Discard all cached responses
+    '''
+    with LOCK:
+        CACHE['entries'].clear()
+        CACHE['nbytes'] = 0
+    # All done
+
+
+def fastlen(npts):
+    '''
+    Returns a fast FFT length for the convolution of npts samples
+    (smallest 5-smooth length larger than or equal to 2*npts)
+    '''
+    # All done
+    return fftbackend.next_fast_len(2*npts)
+
+
+def pzkey(PZ):
+    '''
+    Returns a hashable key for a poles and zeros dictionary
+    Args:
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+    '''
+    zeros = tuple(complex(z) for z in PZ['zeros'])
+    poles = tuple(complex(p) for p in PZ['poles'])
+    # All done
+    return zeros, poles, float(PZ['Const'])
+
+
+def getresp(PZ, nfft, delta, dtype='complex128'):
+    '''
+    Returns the response evaluated at the rfft frequencies of nfft samples
+    (cached, the output array must not be modified)
+    Args:
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        * nfft: number of samples of the FFT
+        * delta: sampling step (in sec)
+        * dtype: 'complex128' or 'complex64'
+    '''
+    args = (pzkey(PZ), int(nfft), float(delta), str(np.dtype(dtype)))
+    # All done
+    return _cached(('resp',)+args, _resp, *args)
+
+
+def getinvresp(PZ, nfft, delta, water_level=60., prefilt=None, dtype='complex128'):
+    '''
+    Returns the inverse response evaluated at the rfft frequencies of nfft
+    samples (cached, the output array must not be modified)
+    Args:
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        * nfft: number of samples of the FFT
+        * delta: sampling step (in sec)
+        * water_level: water level (in dB below the maximum amplitude of the
+                       response) or None
+        * prefilt: (f1,f2,f3,f4) cosine taper applied in the frequency domain
+                   (in Hz, 0 below f1 and above f4, 1 between f2 and f3) or None
+        * dtype: 'complex128' or 'complex64'
+    '''
+    if prefilt is not None:
+        prefilt = tuple(float(f) for f in prefilt)
+        assert len(prefilt) == 4, 'prefilt must be (f1,f2,f3,f4)'
+    if water_level is not None:
+        water_level = float(water_level)
+    args = (pzkey(PZ), int(nfft), float(delta), water_level, prefilt, str(np.dtype(dtype)))
+    # All done
+    return _cached(('invresp',)+args, _invresp, *args)
+
+
+def _cached(key, func, *args):
+    '''
+    Returns func(*args) from the response cache (evaluated and cached if
+    needed, least recently used entries are discarded when the size of
+    the cache exceeds CACHE['maxbytes'])
+    '''
+    entries = CACHE['entries']
+    with LOCK:
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+    value = func(*args)
+    value.flags.writeable = False # shared between calls
+    with LOCK:
+        if key not in entries and value.nbytes <= CACHE['maxbytes']:
+            entries[key] = value
+            CACHE['nbytes'] += value.nbytes
+            while CACHE['nbytes'] > CACHE['maxbytes']:
+                k,v = entries.popitem(last=False)
+                CACHE['nbytes'] -= v.nbytes
+    # All done
+    return value
+
+
+@profiling.timed('response.evaluate')
+def _resp(key, nfft, delta, dtype='complex128'):
+    '''
+    Response evaluation
+    '''
+    zeros,poles,const = key
+    PZ   = {'zeros': zeros, 'poles': poles, 'Const': const}
+    resp = pzresp(PZ, np.fft.rfftfreq(nfft, d=delta))
+    # All done
+    return resp.astype(dtype, copy=False)
+
+
+def _invresp(key, nfft, delta, water_level, prefilt, dtype='complex128'):
+    '''
+    Inverse response evaluation
+    '''
+    resp = _resp(key, nfft, delta)
+    amp  = np.abs(resp)
+
+    # Water level
+    if water_level is not None:
+        wl   = amp.max() * 10.**(-water_level/20.)
+        resp = np.where(amp < wl, wl*np.exp(1.j*np.angle(resp)), resp)
+        amp  = np.abs(resp)
+
+    # Inverse response
+    inv = np.zeros(resp.shape, dtype=resp.dtype)
+    nz  = amp > 0.
+    inv[nz] = 1./resp[nz]
+
+    # Pre-filter
+    if prefilt is not None:
+        inv *= costaper(np.fft.rfftfreq(nfft, d=delta), *prefilt)
+    # All done
+    return inv.astype(dtype, copy=False)
+
+
+def costaper(freq, f1, f2, f3, f4):
+    '''
+    Cosine taper in the frequency domain (0 below f1 and above f4, 1 between f2 and f3)
+    '''
+    assert f1 <= f2 <= f3 <= f4, 'prefilt frequencies must be increasing'
+    taper = np.zeros(freq.shape)
+    taper[(freq >= f2) & (freq <= f3)] = 1.
+    i = (freq > f1) & (freq < f2)
+    taper[i] = 0.5*(1.-np.cos(np.pi*(freq[i]-f1)/(f2-f1)))
+    i = (freq > f3) & (freq < f4)
+    taper[i] = 0.5*(1.+np.cos(np.pi*(freq[i]-f3)/(f4-f3)))
+    # All done
+    return taper
+
+
+def detrend(w):
+    '''
+    Trivial detrend (removes the line joining the first and last samples)
+    of w along the last axis (in place)
+    '''
+    npts = w.shape[-1]
+    w -= w[...,:1]+np.arange(npts,dtype=w.dtype)*((w[...,-1:]-w[...,:1])/(npts-1))
+    # All done
+    return w
+
+
+def convolve(w, delta, PZ, precision=None):
+    '''
+    Convolve w with an instrument response (along the last axis)
+    Args:
+        * w: data points (1-D or 2-D array)
+        * delta: sampling step (in sec)
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        * precision: 'single', 'double' or None (see sac.set_precision)
+    '''
+    rdtype,cdtype = get_dtypes(precision)
+    npts = w.shape[-1]
+    nfft = fastlen(npts)
+    resp = getresp(PZ, nfft, delta, cdtype)
+    wf = fftbackend.rfft(detrend(w.astype(rdtype)), nfft, axis=-1)
+    wf *= resp
+    yo = fftbackend.irfft(wf, nfft, axis=-1)
+    # All done
+    return yo[...,:npts].astype('float32')
+
+
+def deconvolve(w, delta, PZ, water_level=60., prefilt=None, precision=None):
+    '''
+    Remove an instrument response from w (along the last axis)
+    Args:
+        * w: data points (1-D or 2-D array)
+        * delta: sampling step (in sec)
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        * water_level: water level in dB (see getinvresp)
+        * prefilt: (f1,f2,f3,f4) frequency domain taper (see getinvresp)
+        * precision: 'single', 'double' or None (see sac.set_precision)
+    '''
+    rdtype,cdtype = get_dtypes(precision)
+    npts = w.shape[-1]
+    nfft = fastlen(npts)
+    inv  = getinvresp(PZ, nfft, delta, water_level, prefilt, cdtype)
+    wf = fftbackend.rfft(detrend(w.astype(rdtype)), nfft, axis=-1)
+    wf *= inv
+    yo = fftbackend.irfft(wf, nfft, axis=-1)
+    # All done
+    return yo[...,:npts].astype('float32')
@@ -5,33 +5,199 @@ Written by Z. Duputel, December 2013
 '''
 
 import os,sys
+import mmap
+import operator
 import numpy  as np
 import shutil as sh
 import scipy.signal as signal
 from copy     import deepcopy
 from datetime import datetime, timedelta
 
+from . import profiling
+
 
 NVHDR = 6
 ITIME = 1
 
 
+# SAC header layout (632 bytes): 70 floats, 40 ints and 192 bytes of chars
+#   (name, number of values) for numeric blocks, (name, length, count) for chars
+HEADER_SIZE = 632
+HEADER_FLOATS = [('delta',1), ('depmin',1), ('depmax',1), ('scale',1), ('odelta',1),
+                 ('b',1), ('e',1), ('o',1), ('a',1), ('internal1',1), ('t',10),
+                 ('f',1), ('resp',10), ('stla',1), ('stlo',1), ('stel',1), ('stdp',1),
+                 ('evla',1), ('evlo',1), ('evel',1), ('evdp',1), ('mag',1), ('user',10),
+                 ('dist',1), ('az',1), ('baz',1), ('gcarc',1), ('internal2',1),
+                 ('internal3',1), ('depmen',1), ('cmpaz',1), ('cmpinc',1),
+                 ('xminimum',1), ('xmaximum',1), ('yminimum',1), ('ymaximum',1),
+                 ('_unused_f0',7)]
+HEADER_INTS   = [('nzyear',1), ('nzjday',1), ('nzhour',1), ('nzmin',1), ('nzsec',1),
+                 ('nzmsec',1), ('nvhdr',1), ('norid',1), ('nevid',1), ('npts',1),
+                 ('internal4',1), ('nwfid',1), ('nxsize',1), ('nysize',1),
+                 ('_unused_i0',1), ('iftype',1), ('idep',1), ('iztype',1),
+                 ('_unused_i1',1), ('iinst',1), ('istreg',1), ('ievreg',1),
+                 ('ievtyp',1), ('iqual',1), ('isynth',1), ('imagtyp',1), ('imagsrc',1),
+                 ('_unused_i2',8), ('leven',1), ('lpspol',1), ('lovrok',1),
+                 ('lcalda',1), ('_unused_i3',1)]
+HEADER_CHARS  = [('kstnm',8,1), ('kevnm',16,1), ('khole',8,1), ('ko',8,1), ('ka',8,1),
+                 ('kt',8,10), ('kf',8,1), ('kuser',8,3), ('kcmpnm',8,1),
+                 ('knetwk',8,1), ('kdatrd',8,1), ('kinst',8,1)]
+
+
+def header_dtype(endian='<'):
+    '''
+    Returns the structured dtype describing the SAC header
+    Args:
+        * endian: '<' (little-endian) or '>' (big-endian)
+    '''
+    fields = []
+    for name,n in HEADER_FLOATS:
+        fields.append((name,endian+'f4',(n,)) if n>1 else (name,endian+'f4'))
+    for name,n in HEADER_INTS:
+        fields.append((name,endian+'i4',(n,)) if n>1 else (name,endian+'i4'))
+    for name,l,n in HEADER_CHARS:
+        fields.append((name,'V%d'%(l),(n,)) if n>1 else (name,'V%d'%(l)))
+    dtype = np.dtype(fields)
+    assert dtype.itemsize == HEADER_SIZE, 'Inconsistent SAC header layout'
+    # All done
+    return dtype
+
+HEADER_DTYPE = {'<': header_dtype('<'), '>': header_dtype('>')}
+
+# Field groups used to decode/encode headers in bulk
+HEADER_FSCALARS = [n for n,c in HEADER_FLOATS if c==1]
+HEADER_ISCALARS = [n for n,c in HEADER_INTS if c==1 and n[0]!='_']
+HEADER_FARRAYS  = [n for n,c in HEADER_FLOATS if c>1 and n[0]!='_']
+_get_fscalars = operator.itemgetter(*[HEADER_DTYPE['<'].names.index(n) for n in HEADER_FSCALARS])
+_get_iscalars = operator.itemgetter(*[HEADER_DTYPE['<'].names.index(n) for n in HEADER_ISCALARS])
+
+# Processing precision: 'double' (computations in float64/complex128, 
+# time-domain data cast back to float32 except for ifft outputs) or 'single' (float32/complex64 
+# end to end, half the memory and bandwidth). See set_precision.
+PRECISIONS = {'single': ('float32','complex64'),
+              'double': ('float64','complex128')}
+POLICY = {'precision': 'double'}
+
+
+def set_precision(precision):
+    '''
+    Set the default processing precision of sac and SacArray objects
+    (can be overriden for each object by setting obj.precision)
+    Args:
+        * precision: 'single' or 'double'
+    '''
+    assert precision in PRECISIONS, 'precision must be single or double'
+    POLICY['precision'] = precision
+    # All done
+
+
+def get_dtypes(precision=None):
+    '''
+    Returns the real and complex dtypes used for processing
+    Args:
+        * precision: 'single', 'double' or None (default precision)
+    '''
+    if precision is None:
+        precision = POLICY['precision']
+    assert precision in PRECISIONS, 'precision must be single or double'
+    # All done
+    return PRECISIONS[precision]
+
+
 def unpack_c(chararray,rm_spaces=True):
-    S = ''
-    for c in chararray:
-        c = c.decode('utf-8')
-        if rm_spaces and (c == ' ' or c == ''):
-            break
-        S+=c
-    return S
+    '''
+    Convert a SAC character field (bytes or array of chars) into a string
+    Args:
+        * chararray: bytes, np.void or array of chars
+        * rm_spaces: if True, stop at the first blank or null character
+    '''
+    if isinstance(chararray,np.ndarray):
+        chararray = chararray.tobytes()
+    S = bytes(chararray)
+    if rm_spaces:
+        S = S.split(b' ',1)[0].split(b'\x00',1)[0]
+    else:
+        S = S.replace(b'\x00',b'')
+    return S.decode('utf-8')
 
 
 def pack_c(char,size):
-    S = deepcopy(char)
-    c_size = len(char)
-    for i in range(size-c_size):
-        S = S+' '
-    return np.array(S,dtype='c')
+    '''
+    Convert a string into a blank-padded SAC character field
+    Args:
+        * char: input string
+        * size: length of the character field
+    '''
+    return char.encode('utf-8')[:size].ljust(size,b' ')
+
+
+def pzresp(PZ,freq):
+    '''
+    Return the frequency response of a poles and zeros instrument response
+    Args:
+        * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        * freq: frequency vector (in Hz)
+    '''
+    s = 2.j*np.pi*freq
+    resp = np.ones(s.shape,dtype=np.complex128)*PZ['Const']
+    for z in PZ['zeros']: resp *= s-z
+    for p in PZ['poles']: resp /= s-p
+    # All done
+    return resp
+
+
+def amplitude_stats(x,out=None,blocksize=65536):
+    '''
+    Returns the minimum, maximum and mean of x in a single pass over the
+    data (x is processed by blocks that fit in cache). As for x.min(), 
+    x.max() and x.mean(), NaNs are propagated to all statistics.
+    Args:
+        * x: data points
+        * out: optional array in which x is copied during the pass
+        * blocksize: number of samples per block
+    '''
+    n = len(x)
+    if n == 0:
+        return -12345.,-12345.,-12345.
+    xmin = xmax = None
+    xsum = 0.
+    for i in range(0,n,blocksize):
+        blk = x[i:i+blocksize]
+        if out is not None:
+            out[i:i+blocksize] = blk
+        bmin = blk.min()
+        bmax = blk.max()
+        xmin = bmin if xmin is None else np.minimum(xmin,bmin)
+        xmax = bmax if xmax is None else np.maximum(xmax,bmax)
+        xsum += blk.sum(dtype='float64')
+    # All done
+    return xmin, xmax, type(xmin)(xsum/n)
+
+
+def owndata(x):
+    '''
+    Returns True if x owns its memory or is a private memory-map of a file
+    (i.e., x can be modified in place without affecting other objects)
+    '''
+    # All done
+    return x.flags.owndata or isinstance(x.base,mmap.mmap)
+
+
+def checkendian(hbuf,fsize):
+    '''
+    Returns float and int types of a SAC header given the file size
+    Args:
+       * hbuf: header buffer (at least 632 bytes)
+       * fsize: size of the SAC file in bytes
+    '''
+    if len(hbuf) < HEADER_SIZE:
+        raise SacError("SAC header is truncated !")
+    npts = np.frombuffer(hbuf,'<i4',1,316)[0]
+    if fsize==632+4*int(npts):
+        return '<f4','<i4'
+    elif fsize==632+4*int(npts.byteswap()):
+        return '>f4','>i4'
+    raise SacError("Number of points in header and length of trace inconsistent !")
 
 
 class SacError(Exception):
@@ -144,125 +310,138 @@ class sac(object):
         # Spectrum flag
         self.spec = False
 
+        # Processing precision (None: default precision, see set_precision)
+        self.precision = None
+
         # All done
         
 
-    def read(self,FILE,npts=None,datflag=True):
+    @property
+    def depvar(self):
+        '''
+        Data points (data read from files in non-native byte order are 
+        byteswapped when first accessed, see byteorder). Data are swapped
+        in place only if the array owns its memory or is a private 
+        memory-map of a sac file (buffers of from_buffer are not modified)
+        '''
+        d = self._depvar
+        if isinstance(d,np.ndarray) and not d.dtype.isnative:
+            if d.flags.writeable and owndata(d):
+                d = d.byteswap(inplace=True).view(d.dtype.newbyteorder())
+            else:
+                d = d.astype(d.dtype.newbyteorder())
+            self._depvar = d # amplitude statistics are unchanged
+        return d
+
+    @depvar.setter
+    def depvar(self,value):
+        self._depvar = value
+        self.resetstats()
+
+
+    @property
+    def byteorder(self):
+        '''
+        Byte order in which data points are currently stored ('<' or '>'),
+        i.e., the byte order of the sac file until depvar is accessed
+        '''
+        d = self._depvar
+        if isinstance(d,np.ndarray) and d.dtype.byteorder in '<>':
+            return d.dtype.byteorder
+        return '<' if sys.byteorder == 'little' else '>'
+
+
+    @property
+    def depmin(self):
+        '''
+        Minimum amplitude (computed from depvar when needed)
+        '''
+        if self._depmin is None:
+            self._setstats()
+        return self._depmin
+
+    @depmin.setter
+    def depmin(self,value):
+        self._depmin = value
+
+
+    @property
+    def depmax(self):
+        '''
+        Maximum amplitude (computed from depvar when needed)
+        '''
+        if self._depmax is None:
+            self._setstats()
+        return self._depmax
+
+    @depmax.setter
+    def depmax(self,value):
+        self._depmax = value
+
+
+    @property
+    def depmen(self):
+        '''
+        Mean amplitude (computed from depvar when needed)
+        '''
+        if self._depmen is None:
+            self._setstats()
+        return self._depmen
+
+    @depmen.setter
+    def depmen(self,value):
+        self._depmen = value
+
+
+    def resetstats(self):
+        '''
+        Mark depmin, depmax and depmen as outdated (they will be computed 
+        from depvar when accessed). This is done each time depvar is 
+        re-assigned but must be called if depvar is modified in place
+        outside sac methods.
+        '''
+        self._depmin = None
+        self._depmax = None
+        self._depmen = None
+
+        
+    def _setstats(self,out=None):
+        '''
+        Compute depmin, depmax and depmen in a single pass over depvar
+        Args:
+           * out: optional array in which depvar is copied during the pass
+        '''
+        self._depmin,self._depmax,self._depmen = amplitude_stats(self._depvar,out)
+
+        
+    @profiling.timed('sac.read')
+    def read(self,FILE,npts=None,datflag=True,mmap=False,window=None,ref='b'):
         '''
         Read sac file
         Args:
            * FILE: input sac file name
            * npts: number of data points to be read
            * datflag: True: read data, False: read header only
+           * mmap: if True, depvar is a copy-on-write memory-map of the file
+                   (data pages are only loaded when accessed)
+           * window: (t1,t2) only read data between t1 and t2 (in sec) relative 
+                     to the ref marker (npts is then ignored)
+           * ref: reference marker for window ('b', 'o', 'a' or 't0',...,'t9')
         '''
         # Open file
         fid     = open(FILE,'rb')
         
-        # Check endianness
-        fid.seek(316,0)
-        npts = np.fromfile(fid,'<i4',1)[0]
+        # Read the whole header at once
+        hbuf  = fid.read(HEADER_SIZE)
+        profiling.record('sac.read',bytes_read=len(hbuf))
         fid.seek(0,2)
         fsize = fid.tell()
-        if fsize==632+4*npts:
-            ftype='<f4'
-            itype='<i4'
-        elif fsize==632+4*npts.byteswap():
-            ftype='>f4'
-            itype='>i4'
-        else:
-            raise SacError("Number of points in header and length of trace inconsistent !")
         
-        # Read header
-        fid.seek(0,0)
-        self.delta     = np.fromfile(fid,ftype,1)[0]
-        self.depmin    = np.fromfile(fid,ftype,1)[0]
-        self.depmax    = np.fromfile(fid,ftype,1)[0]
-        self.scale     = np.fromfile(fid,ftype,1)[0]
-        self.odelta    = np.fromfile(fid,ftype,1)[0]
-        self.b         = np.fromfile(fid,ftype,1)[0]
-        self.e         = np.fromfile(fid,ftype,1)[0]
-        self.o         = np.fromfile(fid,ftype,1)[0]
-        self.a         = np.fromfile(fid,ftype,1)[0]
-        self.internal1 = np.fromfile(fid,ftype, 1)[0]
-        self.t         = np.fromfile(fid,ftype,10)
-        self.f         = np.fromfile(fid,ftype,1)[0]
-        self.resp      = np.fromfile(fid,ftype,10)
-        self.stla      = np.fromfile(fid,ftype,1)[0]
-        self.stlo      = np.fromfile(fid,ftype,1)[0]
-        self.stel      = np.fromfile(fid,ftype,1)[0]
-        self.stdp      = np.fromfile(fid,ftype,1)[0]
-        self.evla      = np.fromfile(fid,ftype,1)[0]
-        self.evlo      = np.fromfile(fid,ftype,1)[0]
-        self.evel      = np.fromfile(fid,ftype,1)[0]
-        self.evdp      = np.fromfile(fid,ftype,1)[0]
-        self.mag       = np.fromfile(fid,ftype,1)[0]
-        self.user      = np.fromfile(fid,ftype,  10)
-        self.dist      = np.fromfile(fid,ftype,1)[0]
-        self.az        = np.fromfile(fid,ftype,1)[0]
-        self.baz       = np.fromfile(fid,ftype,1)[0]
-        self.gcarc     = np.fromfile(fid,ftype,1)[0]
-        self.internal2 = np.fromfile(fid,ftype,1)[0]
-        self.internal3 = np.fromfile(fid,ftype,1)[0]
-        self.depmen    = np.fromfile(fid,ftype,1)[0]
-        self.cmpaz     = np.fromfile(fid,ftype,1)[0]
-        self.cmpinc    = np.fromfile(fid,ftype,1)[0]
-        self.xminimum  = np.fromfile(fid,ftype,1)[0]
-        self.xmaximum  = np.fromfile(fid,ftype,1)[0]
-        self.yminimum  = np.fromfile(fid,ftype,1)[0]
-        self.ymaximum  = np.fromfile(fid,ftype,1)[0]
-        fid.seek(7*4,1)
-        self.nzyear    = np.fromfile(fid,itype,1)[0]
-        self.nzjday    = np.fromfile(fid,itype,1)[0]
-        self.nzhour    = np.fromfile(fid,itype,1)[0]
-        self.nzmin     = np.fromfile(fid,itype,1)[0]
-        self.nzsec     = np.fromfile(fid,itype,1)[0]
-        self.nzmsec    = np.fromfile(fid,itype,1)[0]
-        self.nvhdr     = np.fromfile(fid,itype,1)[0]
-        self.norid     = np.fromfile(fid,itype,1)[0]
-        self.nevid     = np.fromfile(fid,itype,1)[0]
-        self.npts      = np.fromfile(fid,itype,1)[0]
-        self.internal4 = np.fromfile(fid,itype,1)[0]
-        self.nwfid     = np.fromfile(fid,itype,1)[0]
-        self.nxsize    = np.fromfile(fid,itype,1)[0]
-        self.nysize    = np.fromfile(fid,itype,1)[0]
-        fid.seek(4,1);
-        self.iftype    = np.fromfile(fid,itype,1)[0]
-        self.idep      = np.fromfile(fid,itype,1)[0]
-        self.iztype    = np.fromfile(fid,itype,1)[0]
-        fid.seek(4,1);
-        self.iinst     = np.fromfile(fid,itype,1)[0]
-        self.istreg    = np.fromfile(fid,itype,1)[0]
-        self.ievreg    = np.fromfile(fid,itype,1)[0]
-        self.ievtyp    = np.fromfile(fid,itype,1)[0]
-        self.iqual     = np.fromfile(fid,itype,1)[0]
-        self.isynth    = np.fromfile(fid,itype,1)[0]
-        self.imagtyp   = np.fromfile(fid,itype,1)[0]
-        self.imagsrc   = np.fromfile(fid,itype,1)[0]
-        fid.seek(8*4,1);
-        self.leven     = np.fromfile(fid,itype,1)[0]
-        self.lpspol    = np.fromfile(fid,itype,1)[0]
-        self.lovrok    = np.fromfile(fid,itype,1)[0]
-        self.lcalda    = np.fromfile(fid,itype,1)[0]
-        fid.seek(4,1);
-        self.kstnm     = unpack_c(np.fromfile(fid,'c',8))
-        self.kevnm     = unpack_c(np.fromfile(fid,'c',16),False)
-        self.khole     = unpack_c(np.fromfile(fid,'c',8))
-        self.ko        = unpack_c(np.fromfile(fid,'c',8))
-        self.ka        = unpack_c(np.fromfile(fid,'c',8))
-        for i in range(10):
-            self.kt[i] = unpack_c(np.fromfile(fid,'c',8))
-        self.kf = unpack_c(np.fromfile(fid,'c',8))
-        for i in range(3):
-            self.kuser[i] = unpack_c(np.fromfile(fid,'c',8))
-        self.kcmpnm = unpack_c(np.fromfile(fid,'c',8))
-        self.knetwk = unpack_c(np.fromfile(fid,'c',8))
-        self.kdatrd = unpack_c(np.fromfile(fid,'c',8))
-        self.kinst  = unpack_c(np.fromfile(fid,'c',8))
-        self.e = self.b + float(self.npts-1) * self.delta
-        if self.khole=='' or self.khole=='-12345':
-            self.khole = '--'
-        self.id = self.knetwk+'_'+self.kstnm+'_'+self.khole+'_'\
-                     +self.kcmpnm                        
+        # Check endianness
+        ftype,itype = self._checkendian(hbuf,fsize)
+        
+        # Decode header
+        self._setheader(np.frombuffer(hbuf,HEADER_DTYPE[ftype[0]],1)[0])
 
         # Don't read waveform
         if not datflag: 
@@ -270,141 +449,255 @@ class sac(object):
             # All done
             return
 
+        # Samples to be read
+        i1 = self._readsamples(npts,window,ref)
+
         # Read waveform
-        fid.seek(632,0);
-        if npts is None or npts < 0 or npts > self.npts:
-            npts = self.npts
+        if mmap:
+            fid.close()
+            if self.npts > 0:
+                self.depvar = np.memmap(FILE,ftype,'c',HEADER_SIZE+4*i1,(self.npts,))
         else:
-            self.npts = int(npts)            
-        if self.npts > 0:
-            self.depvar = np.fromfile(fid,ftype,self.npts)
-        fid.close()
+            fid.seek(HEADER_SIZE+4*i1,0)
+            if self.npts > 0:
+                self.depvar = np.fromfile(fid,ftype,self.npts)
+                profiling.record('sac.read',bytes_read=self._depvar.nbytes)
+            fid.close()
 
-        # Re-assign min/max amplitudes and end time
-        self.depmin  = self.depvar.min()
-        self.depmax  = self.depvar.max()
+        # Re-assign end time
         self.e       = self.b + float(self.npts - 1) * self.delta
         
         # All done
 
         
-    def write(self,FILE):
+    @profiling.timed('sac.from_buffer')
+    def from_buffer(self,buf,npts=None,datflag=True,window=None,ref='b'):
+        '''
+        Read sac data from memory (e.g., downloaded objects, tar members)
+        depvar is a view of the buffer (no copy), read-only if buf is 
+        immutable (e.g., bytes). Returns self.
+        Args:
+           * buf: binary sac content (bytes, bytearray, memoryview, or 
+                  file-like object opened in binary mode, which is read 
+                  until the end)
+           * npts, datflag, window, ref: see read
+        '''
+        # Read file-like objects
+        if hasattr(buf,'read'):
+            buf = buf.read()
+        raw = np.frombuffer(buf,'uint8')
+
+        # Check endianness
+        ftype,itype = checkendian(raw[:HEADER_SIZE],raw.size)
+
+        # Decode header
+        self._setheader(raw[:HEADER_SIZE].view(HEADER_DTYPE[ftype[0]])[0])
+
+        # Don't read waveform
+        if not datflag:
+            # All done
+            return self
+
+        # Data view
+        i1 = self._readsamples(npts,window,ref)
+        if self.npts > 0:
+            self.depvar = raw[HEADER_SIZE+4*i1:HEADER_SIZE+4*(i1+self.npts)].view(ftype)
+
+        # Re-assign end time
+        self.e = self.b + float(self.npts - 1) * self.delta
+
+        # All done
+        return self
+
+
+    def _readsamples(self,npts,window,ref):
+        '''
+        Set npts (and b) for the samples to be read
+        Returns the index of the first sample to be read
+        Args:
+           * npts, window, ref: see read
+        '''
+        i1 = 0
+        if window is not None:
+            i1,i2 = self._windowsamples(window,ref)
+            i1 = max(i1,0)
+            i2 = min(i2,self.npts-1)
+            assert i2 >= i1, 'Time window is outside of the data'
+            npts = i2 - i1 + 1
+            self.b += i1 * self.delta
+        elif npts is None or npts < 0 or npts > self.npts:
+            npts = self.npts
+        self.npts = int(npts)
+        # All done
+        return i1
+
+
+    @profiling.timed('sac.write')
+    def write(self,FILE,byteorder='native'):
         '''
         Write sac file
         Args:
-           * FILE: output sac file name
+           * FILE: output sac file name or file-like object opened in 
+                   binary mode
+           * byteorder: '<' (little-endian), '>' (big-endian), 'native' or
+                        'keep' (byte order in which data are stored, i.e., 
+                        the byte order of the input file if depvar was not
+                        accessed, see self.byteorder)
+        '''
+
+        # Assemble header and data
+        buf = self._tobuffer(byteorder)
+
+        # Write to a file-like object
+        if hasattr(FILE,'write'):
+            FILE.write(memoryview(buf))
+            profiling.record('sac.write',bytes_written=buf.nbytes)
+            # All done
+            return
+
+        # Write file
+        fid = open(FILE,'wb')
+        fid.write(buf)
+        fid.close()
+        profiling.record('sac.write',bytes_written=buf.nbytes)
+                
+        # All done
+
+
+    def to_bytes(self,byteorder='native'):
+        '''
+        Returns the binary SAC file (header and data) as bytes
+        Args:
+           * byteorder: '<', '>', 'native' or 'keep' (see write)
+        '''
+        # All done
+        return self._tobuffer(byteorder).tobytes()
+
+
+    @profiling.timed('sac.encode')
+    def _tobuffer(self,byteorder='native'):
+        '''
+        Assemble header and data in a single preallocated buffer
+        Args:
+           * byteorder: '<', '>', 'native' or 'keep' (see write)
         '''
 
         # Check that we are in the time domain
         assert not self.spec, "Can only save seismograms in the time-domain"
         
         # convert to list
-        if type(self.depvar)==list:
-            self.depvar = np.array(self.depvar)
+        if type(self._depvar)==list:
+            self.depvar = np.array(self._depvar)
         
-        # Dummy variables
-        dumi = np.array(-12345    ,dtype='int32')
-        dumf = np.array(-12345.0  ,dtype='float32')
-        dumc = np.array('-12345  ',dtype='c')
-        
-        # Re-assign min/max amplitudes and end time
-        self.depmin  = self.depvar.min()
-        self.depmax  = self.depvar.max()
+        # Re-assign end time
         self.e = self.b + float(self.npts - 1) * self.delta
 
-        # Write file
-        fid = open(FILE,'wb')
-        np.array(self.delta,dtype='float32').tofile(fid)
-        np.array(self.depmin,dtype='float32').tofile(fid)
-        np.array(self.depmax,dtype='float32').tofile(fid)
-        np.array(self.scale,dtype='float32').tofile(fid)
-        np.array(self.odelta,dtype='float32').tofile(fid)
-        np.array(self.b,dtype='float32').tofile(fid)
-        np.array(self.e,dtype='float32').tofile(fid)
-        np.array(self.o,dtype='float32').tofile(fid)
-        np.array(self.a,dtype='float32').tofile(fid)
-        np.array(self.internal1,dtype='float32').tofile(fid)
-        np.array(self.t,dtype='float32').tofile(fid)
-        np.array(self.f,dtype='float32').tofile(fid)
-        np.array(self.resp,dtype='float32').tofile(fid)
-        np.array(self.stla,dtype='float32').tofile(fid)
-        np.array(self.stlo,dtype='float32').tofile(fid)
-        np.array(self.stel,dtype='float32').tofile(fid)
-        np.array(self.stdp,dtype='float32').tofile(fid)
-        np.array(self.evla,dtype='float32').tofile(fid)
-        np.array(self.evlo,dtype='float32').tofile(fid)
-        np.array(self.evel,dtype='float32').tofile(fid)
-        np.array(self.evdp,dtype='float32').tofile(fid)
-        np.array(self.mag,dtype='float32').tofile(fid)
-        np.array(self.user,dtype='float32').tofile(fid)
-        np.array(self.dist,dtype='float32').tofile(fid)
-        np.array(self.az,dtype='float32').tofile(fid)
-        np.array(self.baz,dtype='float32').tofile(fid)
-        np.array(self.gcarc,dtype='float32').tofile(fid)
-        np.array(self.internal2,dtype='float32').tofile(fid)
-        np.array(self.internal3,dtype='float32').tofile(fid)
-        np.array(self.depmen,dtype='float32').tofile(fid)
-        np.array(self.cmpaz,dtype='float32').tofile(fid)
-        np.array(self.cmpinc,dtype='float32').tofile(fid)
-        np.array(self.xminimum,dtype='float32').tofile(fid)
-        np.array(self.xmaximum,dtype='float32').tofile(fid)
-        np.array(self.yminimum,dtype='float32').tofile(fid)
-        np.array(self.ymaximum,dtype='float32').tofile(fid)  
-        for i in range(7):
-            dumf.tofile(fid)
-        np.array(self.nzyear,dtype='int32').tofile(fid)  
-        np.array(self.nzjday,dtype='int32').tofile(fid)  
-        np.array(self.nzhour,dtype='int32').tofile(fid)
-        np.array(self.nzmin,dtype='int32').tofile(fid)  
-        np.array(self.nzsec,dtype='int32').tofile(fid)  
-        np.array(self.nzmsec,dtype='int32').tofile(fid)  
-        np.array(self.nvhdr,dtype='int32').tofile(fid)  
-        np.array(self.norid,dtype='int32').tofile(fid)  
-        np.array(self.nevid,dtype='int32').tofile(fid)
-        np.array(self.npts,dtype='int32').tofile(fid) 
-        np.array(self.internal4,dtype='int32').tofile(fid)  
-        np.array(self.nwfid,dtype='int32').tofile(fid)
-        np.array(self.nxsize,dtype='int32').tofile(fid)
-        np.array(self.nysize,dtype='int32').tofile(fid)
-        dumi.tofile(fid)
-        np.array(self.iftype,dtype='int32').tofile(fid)
-        np.array(self.idep,dtype='int32').tofile(fid)
-        np.array(self.iztype,dtype='int32').tofile(fid)
-        dumi.tofile(fid)
-        np.array(self.iinst,dtype='int32').tofile(fid)
-        np.array(self.istreg,dtype='int32').tofile(fid)
-        np.array(self.ievreg,dtype='int32').tofile(fid)
-        np.array(self.ievtyp,dtype='int32').tofile(fid)
-        np.array(self.iqual,dtype='int32').tofile(fid)
-        np.array(self.isynth,dtype='int32').tofile(fid)
-        np.array(self.imagtyp,dtype='int32').tofile(fid)
-        np.array(self.imagsrc,dtype='int32').tofile(fid)
-        for i in range(8):
-            dumi.tofile(fid)
-        np.array(self.leven,dtype='int32').tofile(fid)
-        np.array(self.lpspol,dtype='int32').tofile(fid)
-        np.array(self.lovrok,dtype='int32').tofile(fid)
-        np.array(self.lcalda,dtype='int32').tofile(fid)
-        dumi.tofile(fid)
-        pack_c(self.kstnm,8).tofile(fid)  
-        pack_c(self.kevnm,16).tofile(fid)  
-        pack_c(self.khole,8).tofile(fid)
-        pack_c(self.ko,8).tofile(fid)
-        pack_c(self.ka,8).tofile(fid)
-        for i in range(10):
-            pack_c(self.kt[i],8).tofile(fid)
-        pack_c(self.kf,8).tofile(fid)
-        for i in range(3):
-            pack_c(self.kuser[i],8).tofile(fid)
-        pack_c(self.kcmpnm,8).tofile(fid)
-        pack_c(self.knetwk,8).tofile(fid)
-        pack_c(self.kdatrd,8).tofile(fid)
-        pack_c(self.kinst,8).tofile(fid)
-
-        # Write data
-        np.array(self.depvar,dtype='float32').tofile(fid)
-        fid.close()
-                
+        # Output byte order (data are converted while copied, if needed)
+        if byteorder == 'native':
+            endian = '<' if sys.byteorder == 'little' else '>'
+        elif byteorder == 'keep':
+            endian = self.byteorder
+        else:
+            assert byteorder in ('<','>'), 'byteorder must be <, >, native or keep'
+            endian = byteorder
+
+        # Fill buffer (amplitude statistics are updated while data are copied)
+        buf = np.empty((HEADER_SIZE+4*self._depvar.size,),dtype='uint8')
+        self._setstats(out=buf[HEADER_SIZE:].view(endian+'f4'))
+        buf[:HEADER_SIZE].view(HEADER_DTYPE[endian])[0] = self._getheader()
+
+        # All done
+        return buf
+
+
+    @profiling.timed('sac.header_encode')
+    def _getheader(self):
+        '''
+        Returns the header variables as a tuple ordered as HEADER_DTYPE fields
+        '''
+        vals = []
+        for name,n in HEADER_FLOATS:
+            vals.append(-12345. if name[0]=='_' else getattr(self,name))
+        for name,n in HEADER_INTS:
+            vals.append(-12345 if name[0]=='_' else getattr(self,name))
+        for name,l,n in HEADER_CHARS:
+            if n > 1:
+                vals.append([pack_c(c,l) for c in getattr(self,name)])
+            else:
+                vals.append(pack_c(getattr(self,name),l))
+
+        # All done
+        return tuple(vals)
+
+    
+    def _checkendian(self,hbuf,fsize):
+        '''
+        Returns float and int types of a SAC header given the file size
+        (see checkendian)
+        '''
+        # All done
+        return checkendian(hbuf,fsize)
+
+        
+    def _markertime(self,ref):
+        '''
+        Returns the time of a header marker
+        Args:
+           * ref: 'b', 'e', 'o', 'a' or 't0',...,'t9'
+        '''
+        if ref in ('b','e','o','a'):
+            tref = getattr(self,ref)
+        elif len(ref)==2 and ref[0]=='t' and ref[1].isdigit():
+            tref = self.t[int(ref[1])]
+        else:
+            raise ValueError('Incorrect reference marker (%s)'%(ref))
+        assert tref != -12345., 'Reference marker %s must be assigned'%(ref)
+        # All done
+        return tref
+
+
+    def _windowsamples(self,window,ref='b'):
+        '''
+        Returns the indices of the first and last samples of a time window
+        (indices can be outside of the data)
+        Args:
+           * window: (t1,t2) time window relative to the ref marker
+           * ref: reference marker ('b', 'o', 'a' or 't0',...,'t9')
+        '''
+        tref = self._markertime(ref)
+        i1 = int(np.round((tref + window[0] - self.b)/self.delta))
+        i2 = int(np.round((tref + window[1] - self.b)/self.delta))
+        assert i2 >= i1, 'Incorrect time window (t2 must be larger than t1)'
+        # All done
+        return i1,i2
+
+    
+    @profiling.timed('sac.header_decode')
+    def _setheader(self,hdr):
+        '''
+        Assign header variables from a structured header record
+        Args:
+           * hdr: np.void record with dtype HEADER_DTYPE['<'] or HEADER_DTYPE['>']
+        '''
+        vals = hdr.item()
+        for name,v in zip(HEADER_FSCALARS,np.array(_get_fscalars(vals),'float32')):
+            setattr(self,name,v)
+        for name,v in zip(HEADER_ISCALARS,np.array(_get_iscalars(vals),'int32')):
+            setattr(self,name,v)
+        for name in HEADER_FARRAYS:
+            setattr(self,name,hdr[name].astype('float32'))
+        for (name,l,n),v in zip(HEADER_CHARS,vals[-len(HEADER_CHARS):]):
+            if n > 1:
+                v = v.tobytes()
+                setattr(self,name,[unpack_c(v[i:i+l]) for i in range(0,n*l,l)])
+            else:
+                setattr(self,name,unpack_c(v,name!='kevnm'))
+        self.e = self.b + float(self.npts-1) * self.delta
+        if self.khole=='' or self.khole=='-12345':
+            self.khole = '--'
+        self.id = self.knetwk+'_'+self.kstnm+'_'+self.khole+'_'\
+                     +self.kcmpnm                        
+
         # All done
 
         
@@ -489,44 +782,8 @@ class sac(object):
           - list or ndarray
           - real number (float or int)
         '''        
-
-        # Check if the operation can be done
-        accepted=(self.__class__,int,float,list,np.ndarray)
-        assert isinstance(other,accepted), 'Unsuported type'
-        
-        # Copy current object
-        res  = self.copy()
-        flag = False
-
-        # Adding two sac files
-        if isinstance(other,self.__class__):
-            assert self.npts  == other.npts,  'Header field mismatch: npts'
-            assert self.delta == other.delta, 'Header field mismatch: delta'
-            assert self.b     == other.b,     'Header field mismatch: b'
-            assert self.e     == other.e,     'Header field mismatch: e'          
-            res.depvar += other.depvar
-            flag = True
-
-        # Adding array or list
-        if isinstance(other,(list,np.ndarray)):
-            assert len(other)==self.npts, 'Header field mismatch: npts'
-            res.depvar += other
-            flag = True
-
-        # Adding real number
-        if isinstance(other,(int,float)):
-            res.depvar += other
-            flag = True
-
-        # Re-assign min and max amplitudes
-        res.depmin  = res.depvar.min()
-        res.depmax  = res.depvar.max()
-        
-        # Check that operation was done
-        assert flag, 'Operation could not be completed'
-        
         # All done
-        return res
+        return self._binary(other,np.add)
 
     def __sub__(self, other):
         '''
@@ -536,44 +793,8 @@ class sac(object):
           - list or ndarray
           - real number (float or int)
         '''        
-
-        # Check if the operation can be done
-        accepted=(self.__class__,int,float,list,np.ndarray)
-        assert isinstance(other,accepted), 'Unsuported type'
-        
-        # Copy current object
-        res  = self.copy()
-        flag = False
-
-        # Adding two sac files
-        if isinstance(other,self.__class__):
-            assert self.npts  == other.npts,  'Header field mismatch: npts'
-            assert self.delta == other.delta, 'Header field mismatch: delta'
-            assert self.b     == other.b,     'Header field mismatch: b'
-            assert self.e     == other.e,     'Header field mismatch: e'          
-            res.depvar -= other.depvar
-            flag = True
-
-        # Adding array or list
-        if isinstance(other,(list,np.ndarray)):
-            assert len(other)==self.npts, 'Header field mismatch: npts'
-            res.depvar -= other
-            flag = True
-
-        # Adding real number
-        if isinstance(other,(int,float)):
-            res.depvar -= other
-            flag = True
-
-        # Re-assign min and max amplitudes
-        res.depmin  = res.depvar.min()
-        res.depmax  = res.depvar.max()
-        
-        # Check that operation was done
-        assert flag, 'Operation could not be completed'
-        
         # All done
-        return res    
+        return self._binary(other,np.subtract)
 
     def __mul__(self, other):
         '''
@@ -583,63 +804,126 @@ class sac(object):
           - list or ndarray
           - real number (float or int)
         '''        
+        # All done
+        return self._binary(other,np.multiply)
+
+    def __truediv__(self, other):
+        '''
+        Division operation.         
+        other can be:
+          - sacpy.sac object
+          - list or ndarray
+          - real number (float or int)
+        '''        
+        # All done
+        return self._binary(other,np.true_divide)
+
+    def __iadd__(self, other):
+        '''
+        In-place addition (see __add__)
+        '''
+        # All done
+        return self._inplace(other,np.add)
+
+    def __isub__(self, other):
+        '''
+        In-place substraction (see __sub__)
+        '''
+        # All done
+        return self._inplace(other,np.subtract)
+
+    def __imul__(self, other):
+        '''
+        In-place multiplication (see __mul__)
+        '''
+        # All done
+        return self._inplace(other,np.multiply)
+
+    def __itruediv__(self, other):
+        '''
+        In-place division (see __truediv__)
+        '''
+        # All done
+        return self._inplace(other,np.true_divide)
+
+    __div__  = __truediv__
+    __idiv__ = __itruediv__
+
+    def _operand(self, other):
+        '''
+        Check that an operation can be done with other
+        Returns the data points or number to be used in the operation
+        '''
 
         # Check if the operation can be done
         accepted=(self.__class__,int,float,list,np.ndarray)
         assert isinstance(other,accepted), 'Unsuported type'
-        
-        # Copy current object
-        res  = self.copy()
-        flag = False
 
-        # Adding two sac files
+        # sac files
         if isinstance(other,self.__class__):
             assert self.npts  == other.npts,  'Header field mismatch: npts'
             assert self.delta == other.delta, 'Header field mismatch: delta'
             assert self.b     == other.b,     'Header field mismatch: b'
             assert self.e     == other.e,     'Header field mismatch: e'          
-            res.depvar *= other.depvar
-            flag = True
+            return other.depvar
 
-        # Adding array or list
+        # array or list
         if isinstance(other,(list,np.ndarray)):
             assert len(other)==self.npts, 'Header field mismatch: npts'
-            res.depvar *= other
-            flag = True
 
-        # Adding real number
-        if isinstance(other,(int,float)):
-            res.depvar *= other
-            flag = True
+        # All done
+        return other
+
+    @profiling.timed('sac.binary_op')
+    def _binary(self, other, op):
+        '''
+        Returns a new sac object with op applied to self and other
+        (only the header is copied, the output data array is allocated once)
+        '''
+        other = self._operand(other)
+        res = self.copy(data=False)
+        res.depvar = np.empty_like(self.depvar)
+        op(self.depvar,other,out=res.depvar,casting='same_kind')
 
-        # Re-assign min and max amplitudes
-        res.depmin  = res.depvar.min()
-        res.depmax  = res.depvar.max()
-        
-        # Check that operation was done
-        assert flag, 'Operation could not be completed'
-        
         # All done
         return res
 
+    @profiling.timed('sac.inplace_op')
+    def _inplace(self, other, op):
+        '''
+        Apply op to self and other in place
+        (the data are copied first if depvar is a view of data owned by
+        another object, which is not modified)
+        '''
+        other = self._operand(other)
+        d = self.depvar
+        if d.flags.writeable and owndata(d):
+            op(d,other,out=d,casting='same_kind')
+            self.resetstats()
+        else: # depvar is a view of other data (e.g., sac.cut, from_buffer)
+            self.depvar = op(d,other,dtype=d.dtype,casting='same_kind')
+
+        # All done
+        return self
+
     
+    @profiling.timed('sac.integrate')
     def integrate(self):
         '''
         Performs integration using the traperoidal rule
         '''
 
         # Integration
-        w  = self.depvar.copy()
-        wi = self.depvar.cumsum()
-        wi = (2*wi[1:]-(w[0]+w[1:]))*self.delta/2.
-        self.depvar = wi.copy()
+        rdtype,cdtype = get_dtypes(self.precision)
+        w  = self.depvar
+        wi = w.cumsum(dtype=rdtype)
+        wi = (2*wi[1:]-(w[0]+w[1:]))*(self.delta/2.)
+        self.depvar = wi.astype('float32')
 
-        # Re-assign b, e, npts, min/max amplitudes
+        # Re-assign b, e, npts
         self.b += self.delta/2.
         self.npts -= 1
         self.e = self.b + float(self.npts - 1) * self.delta
-        self.depmin  = self.depvar.min()
-        self.depmax  = self.depvar.max()
         
         # All done
         return
@@ -656,38 +940,43 @@ class sac(object):
         return False
 
         
-    def interpolate(self, delta_new):
+    @profiling.timed('sac.interpolate')
+    def interpolate(self, delta_new, method='wsinc', **kwargs):
         '''
-        Interpolates data to a new sampling rate (sinc interpolation)
+        Interpolates data to a new sampling rate
         Args:
             * delta_new: New sampling rate
+            * method: interpolation method (see sacpy.resample for the accuracy/speed trade-off)
+                - 'wsinc': windowed sinc interpolation (default)
+                - 'sinc': sinc interpolation using all samples (slow)
+                - 'fft': Fourier interpolation
+                - 'polyphase': rational-ratio polyphase resampling
+            * kwargs: method specific arguments (e.g., hw for 'wsinc')
         '''
 
+        from . import resample
+
         # Check that headers are correct
         assert not self.isempty(), 'Some sac attributes are missing (e.g., npts, delta, depvar)'
         
-        # time vectors
-        time_old = np.arange(self.npts,dtype='float32')*self.delta # Time vector before interpolation
+        # Interpolation
         npts_new = int(np.floor((self.npts-1)*self.delta/delta_new))
-        time_new = np.arange(npts_new,dtype='float32')*delta_new   # Time vector after interpolation
-
-        # Sinc interpolation
-        depvar_new = np.zeros((npts_new,),dtype='float32')
-        for i in range(npts_new):
-            depvar_new[i] = np.dot(self.depvar,np.sinc((time_new[i]-time_old)/self.delta))        
-        self.depvar = depvar_new.copy()
+        depvar_new = resample.resample(self.depvar,self.delta,delta_new,npts_new,method,**kwargs)
+        self.depvar = depvar_new
         self.npts   = npts_new
         self.delta  = delta_new
+        self.e      = self.b + float(self.npts - 1) * self.delta
 
         # All done
         return
         
 
+    @profiling.timed('sac.decimate')
     def decimate(self, dec_fac):
         '''
         Decimates data
         Args:
-            * dec_fac: decimation factor
+            * dec_fac: decimation factor (any positive integer)
         '''
 
         #import decimate as decim
@@ -696,27 +985,16 @@ class sac(object):
         # Check that headers are correct
         assert not self.isempty(), 'Some sac attributes are missing (e.g., npts, delta, depvar)'
 
-        # Check decimation factor
-        assert dec_fac in decim.FACS, 'Incorrect decimation factor'
-
-        # Init filters
-        fir = {2: decim.FIRfilter(decim.FIRDEC2),
-               3: decim.FIRfilter(decim.FIRDEC3),
-               4: decim.FIRfilter(decim.FIRDEC4),
-               5: decim.FIRfilter(decim.FIRDEC5)}
-
         # Filter cascade
-        fir_cascade = decim.FACS[dec_fac]
-        for c in fir_cascade:
-            assert c>=1 and c<=5, 'Incorrect decimation factor (%d)'%(c)
-            if c==1:
-                continue
-            self.depvar = decim.decimate(self.depvar,fir[c],c)
+        for c in decim.plan(dec_fac):
+            self.depvar = decim.decimate(self.depvar,decim.getfir(c),c)
             self.delta *= np.float32(c)
         self.npts = len(self.depvar)
+        self.e    = self.b + float(self.npts - 1) * self.delta
 
 
-    def filter(self, freq, order=4, btype='lowpass'):
+    @profiling.timed('sac.filter')
+    def filter(self, freq, order=4, btype='lowpass', zerophase=False):
         '''
         Bandpass filter the data using a butterworth filter
         Args:
@@ -724,20 +1002,25 @@ class sac(object):
             * order:  Order of the filter.
             * btype: {'lowpass', 'highpass', 'bandpass', 'bandstop'}, optional
               (default is 'lowpass')
+            * zerophase: if True, the filter is applied forward and backward
+              (zero-phase filtering)
         '''
+
+        from . import filters
         
         # Check that headers are correct
         assert not self.isempty(), 'Some sac attributes are missing (e.g., npts, delta, depvar)'
 
-        # Filter design
-        if type(freq) is list:
-            freq = np.array(freq)
-        Wn = freq * 2. * self.delta # Normalizing frequencies
-        sos = signal.butter(order, Wn, btype, output='sos')
+        # Filter design (cached)
+        rdtype,cdtype = get_dtypes(self.precision)
+        sos = filters.butter(freq, self.delta, order, btype, rdtype)
         
         # Filter waveform
-        depvar = signal.sosfilt(sos, self.depvar)
-        self.depvar = depvar.astype('float32')
+        if zerophase:
+            depvar = signal.sosfiltfilt(sos, self.depvar)
+        else:
+            depvar = signal.sosfilt(sos, self.depvar)
+        self.depvar = depvar.astype('float32',copy=False)
 
         # All done
         return
@@ -765,36 +1048,80 @@ class sac(object):
             nend = int(np.ceil((tmax-te)/self.delta))
 
         # Zero padding
+        if nbeg == 0 and nend == 0:
+            return
         gout = np.pad(self.depvar,((nbeg,nend),),mode="constant")
         self.npts = len(gout)
         self.b = self.b - nbeg * self.delta
         self.e = self.e + nend * self.delta
-        self.depvar = gout.copy()
+        self.depvar = gout
 
         # All done
         return
 
+    @profiling.timed('sac.cut')
+    def cut(self,t1,t2,ref='b',fill=0.):
+        '''
+        Returns the trace between t1 and t2 (in sec) relative to a marker
+        If the time window is within the data, depvar is a view of 
+        self.depvar (no copy). In-place operations on the returned trace
+        (+=, *=, ...) copy its data first so that self is not modified.
+        Otherwise, a new array is allocated and samples outside the data
+        are set to fill.
+        Args:
+            * t1, t2: time window relative to the ref marker
+            * ref: reference marker ('b', 'e', 'o', 'a' or 't0',...,'t9')
+            * fill: value of samples outside the data (e.g., 0. or np.nan)
+        '''
+        assert not self.spec, 'Can only cut seismograms in the time-domain'
+        i1,i2 = self._windowsamples((t1,t2),ref)
+        npts  = i2 - i1 + 1
+
+        # Cut data
+        res = self.copy(data=False)
+        if i1 >= 0 and i2 < self.npts:
+            res.depvar = self.depvar[i1:i2+1]
+        else:
+            res.depvar = np.full((npts,),fill,dtype=self.depvar.dtype)
+            j1 = max(i1,0)
+            j2 = min(i2,self.npts-1)
+            if j2 >= j1:
+                res.depvar[j1-i1:j2-i1+1] = self.depvar[j1:j2+1]
+
+        # Re-assign b, e, npts
+        res.npts = npts
+        res.b    = self.b + i1 * self.delta
+        res.e    = res.b + float(npts - 1) * self.delta
+
+        # All done
+        return res
+
+    @profiling.timed('sac.fft')
     def fft(self):
         '''
         Compute fourier transform and return the seismogram spectrum
         Output: Seismogram spectrum in the frequency domain (type: seismogram)        
         '''
-        spectrum = self.copy()
+        from . import fftbackend
+        rdtype,cdtype = get_dtypes(self.precision)
+        spectrum = self.copy(data=False)
         spectrum.spec = True
-        spectrum.depvar = np.fft.rfft(self.depvar)        
+        spectrum.depvar = fftbackend.rfft(self.depvar.astype(rdtype,copy=False)).astype(cdtype,copy=False)
         
         # All done
         return spectrum
 
+    @profiling.timed('sac.ifft')
     def ifft(self):
         '''
         Compute the inverse fourrier transform and returns the seismogram spectrum
         Output: Seismogram in the time domain (type: seismogram)
         '''
-        seis = self.copy()
+        from . import fftbackend
+        rdtype,cdtype = get_dtypes(self.precision)
+        seis = self.copy(data=False)
         seis.spec = False
-        seis.depvar=None
-        seis.depvar = np.fft.irfft(self.depvar) 
+        seis.depvar = fftbackend.irfft(self.depvar.astype(cdtype,copy=False)).astype(rdtype,copy=False)
         
         # All done
         return seis
@@ -813,32 +1140,40 @@ class sac(object):
         Args:
             * PZ: dictionary including 'poles', 'zeros' and 'Const'
         '''
-        s = 2.j*np.pi*self.freq()
-        resp = np.ones(s.shape,dtype=np.complex128)*PZ['Const']
-        for z in PZ['zeros']: resp *= s-z
-        for p in PZ['poles']: resp /= s-p
         # All done
-        return resp
+        return pzresp(PZ,self.freq())
 
+    @profiling.timed('sac.convresp')
     def convresp(self,PZ):
         '''
         Convolve with instrument response
+        (zero padding to a fast FFT length, responses are cached, see response.py)
         Args:
             * PZ: dictionary including 'poles', 'zeros' and 'Const'        
         '''
-        npts = self.npts
-        # Trivial dtrend
-        self.depvar -= self.depvar[0]+np.arange(npts)*(self.depvar[-1]-self.depvar[0])/(npts-1)
-        # Zero padding
-        self.pad(tmax=2*self.e-self.b)
-        # Evaluate the instrument response from Poles and Zeros
-        resp = self.evalresp(PZ)
-        # Convolve with the instrument response
-        self.depvar = np.fft.irfft(resp*np.fft.rfft(self.depvar))[:npts]
-        self.npts = npts
-        self.e    = self.b + float(self.npts)*self.delta
-        self.depmin = self.depvar.min()
-        self.depmax = self.depvar.max()        
+        from . import response
+        assert not self.isempty(), 'Some sac attributes are missing (e.g., npts, delta, depvar)'
+        self.depvar = response.convolve(self.depvar,self.delta,PZ,self.precision)
+        self.e = self.b + float(self.npts - 1) * self.delta
+        # All done
+        return
+
+    @profiling.timed('sac.removeresp')
+    def removeresp(self,PZ,water_level=60.,prefilt=None):
+        '''
+        Remove instrument response (deconvolution)
+        (zero padding to a fast FFT length, responses are cached, see response.py)
+        Args:
+            * PZ: dictionary including 'poles', 'zeros' and 'Const'
+            * water_level: water level in dB below the maximum amplitude of 
+                           the response (None: no water level)
+            * prefilt: (f1,f2,f3,f4) cosine taper applied in the frequency domain
+                       (in Hz, 0 below f1 and above f4, 1 between f2 and f3)
+        '''
+        from . import response
+        assert not self.isempty(), 'Some sac attributes are missing (e.g., npts, delta, depvar)'
+        self.depvar = response.deconvolve(self.depvar,self.delta,PZ,water_level,prefilt,self.precision)
+        self.e = self.b + float(self.npts - 1) * self.delta
         # All done
         return
 
@@ -912,12 +1247,27 @@ class sac(object):
         # All done
         return lines    
         
-    def copy(self):
+    @profiling.timed('sac.copy')
+    def copy(self,data=True):
         '''
         Returns a copy of the sac object
+        Args:
+            * data: if False, only copy the header (depvar is empty)
         '''
+        res = self.__class__.__new__(self.__class__)
+        for name,v in self.__dict__.items():
+            if name == '_depvar':
+                v = np.array(v) if data else np.array([])
+            elif isinstance(v,np.ndarray):
+                v = v.copy()
+            elif isinstance(v,list):
+                v = list(v)
+            elif not isinstance(v,(str,int,float,bool,np.generic,type(None))):
+                v = deepcopy(v)
+            res.__dict__[name] = v
+
         # All done
-        return deepcopy(self)                
+        return res
 
 def zero_pad_start(t,sac,t0):
     tmin = t[0]
@@ -0,0 +1,415 @@
+'''
+A class that deals with sets of sac traces sharing the same delta and npts
+'''
+
+import numpy as np
+import scipy.signal as signal
+from copy import deepcopy
+
+from .sac import sac, get_dtypes
+
+
+# Attributes shared by all traces (not stored as columns)
+SHARED = ('_depvar','delta','npts','spec','precision','_depmin','_depmax','_depmen')
+
+
+class SacArray(object):
+    '''
+    A set of sac traces sharing the same delta and npts
+    Data points are in a contiguous 2-D float32 array (self.depvar, one
+    trace per row) and other header variables are stored as columnar arrays
+    (e.g., self.b is an array including b for each trace).
+    '''
+
+    def __init__(self,traces=None):
+        '''
+        Constructor
+        Args:
+            * traces: list of sac objects (optional)
+        '''
+        self.delta   = -12345.
+        self.npts    = -12345
+        self.spec    = False
+        self.precision = None # None: default precision (see sac.set_precision)
+        self.depvar  = np.zeros((0,0),dtype='float32')
+        self.headers = {}
+
+        # Build from sac objects
+        if traces is not None:
+            self.from_traces(traces)
+
+        # All done
+
+
+    def __getattr__(self,name):
+        '''
+        Access header columns as attributes (e.g., self.b)
+        '''
+        headers = self.__dict__.get('headers',{})
+        if name in headers:
+            return headers[name]
+        raise AttributeError(name)
+
+
+    def __len__(self):
+        '''
+        Number of traces
+        '''
+        return self.depvar.shape[0]
+
+
+    def __getitem__(self,i):
+        '''
+        Returns trace i as a sac object
+        '''
+        return self.to_trace(i)
+
+
+    @property
+    def depmin(self):
+        '''
+        Minimum amplitude of each trace
+        '''
+        return self.depvar.min(axis=-1)
+
+
+    @property
+    def depmax(self):
+        '''
+        Maximum amplitude of each trace
+        '''
+        return self.depvar.max(axis=-1)
+
+
+    @property
+    def depmen(self):
+        '''
+        Mean amplitude of each trace
+        '''
+        return self.depvar.mean(axis=-1,dtype='float64').astype(self.depvar.dtype)
+
+
+    def from_traces(self,traces):
+        '''
+        Fill the SacArray from a list of sac objects
+        Args:
+            * traces: list of sac objects with the same delta and npts
+        '''
+        assert len(traces) > 0, 'Empty list of traces'
+        tr0 = traces[0]
+        for tr in traces:
+            assert tr.npts  == tr0.npts,  'Header field mismatch: npts'
+            assert tr.delta == tr0.delta, 'Header field mismatch: delta'
+            assert tr.spec  == tr0.spec,  'Header field mismatch: spec'
+
+        # Shared attributes
+        self.delta = tr0.delta
+        self.npts  = tr0.npts
+        self.spec  = tr0.spec
+        self.precision = tr0.precision
+
+        # Data points (spectra are stored in the precision of the traces)
+        dtype = np.result_type(*[tr.depvar.dtype for tr in traces]) if self.spec else 'float32'
+        self.depvar = np.empty((len(traces),len(tr0.depvar)),dtype=dtype)
+        for i,tr in enumerate(traces):
+            self.depvar[i] = tr.depvar
+
+        # Header columns
+        self.headers = {}
+        for name in vars(tr0):
+            if name not in SHARED:
+                self.headers[name] = column([getattr(tr,name) for tr in traces])
+
+        # All done
+
+
+    def to_trace(self,i):
+        '''
+        Returns trace i as a sac object
+        '''
+        tr = sac()
+        for name,col in self.headers.items():
+            v = col[i]
+            if isinstance(v,np.ndarray):
+                v = v.copy()
+            elif isinstance(v,list):
+                v = list(v)
+            setattr(tr,name,v)
+        tr.delta  = self.delta
+        tr.npts   = self.npts
+        tr.spec   = self.spec
+        tr.precision = self.precision
+        tr.depvar = self.depvar[i].copy() # depmin, depmax and depmen computed when accessed
+        # All done
+        return tr
+
+
+    def to_traces(self):
+        '''
+        Returns a list of sac objects
+        '''
+        # All done
+        return [self.to_trace(i) for i in range(len(self))]
+
+
+    def copy(self,data=True):
+        '''
+        Returns a copy of the SacArray object
+        Args:
+            * data: if False, only copy the headers (depvar is empty)
+        '''
+        res = self.__class__.__new__(self.__class__)
+        for name,v in self.__dict__.items():
+            if name == 'depvar':
+                v = v.copy() if data else np.zeros((0,0),dtype=v.dtype)
+            else:
+                v = deepcopy(v)
+            res.__dict__[name] = v
+
+        # All done
+        return res
+
+
+    def _update(self):
+        '''
+        Re-assign npts and end times
+        '''
+        self.npts = self.depvar.shape[-1]
+        if 'b' in self.headers and not self.spec:
+            self.headers['e'] = (self.headers['b'] + (self.npts-1)*self.delta).astype(self.headers['b'].dtype)
+
+        # All done
+
+
+    def __add__(self, other):
+        '''
+        Addition operation.
+        other can be:
+          - SacArray object
+          - sac object, list or ndarray (broadcast to all traces)
+          - real number (float or int)
+        '''
+        # All done
+        return self._operation(other,np.add)
+
+    def __sub__(self, other):
+        '''
+        Substraction operation (see __add__)
+        '''
+        # All done
+        return self._operation(other,np.subtract)
+
+    def __mul__(self, other):
+        '''
+        Multiplication operation (see __add__)
+        '''
+        # All done
+        return self._operation(other,np.multiply)
+
+    def _operation(self,other,op):
+        '''
+        Apply operation op between self and other
+        '''
+        # Check if the operation can be done
+        accepted=(self.__class__,sac,int,float,list,np.ndarray)
+        assert isinstance(other,accepted), 'Unsuported type'
+        if isinstance(other,(self.__class__,sac)):
+            assert self.npts  == other.npts,  'Header field mismatch: npts'
+            assert self.delta == other.delta, 'Header field mismatch: delta'
+            assert np.all(self.b == other.b), 'Header field mismatch: b'
+            other = other.depvar
+        if isinstance(other,(list,np.ndarray)):
+            assert np.shape(other)[-1]==self.npts, 'Header field mismatch: npts'
+
+        # Operation (headers are copied)
+        res = self.copy(data=False)
+        res.depvar  = op(self.depvar,other,dtype=self.depvar.dtype)
+
+        # All done
+        return res
+
+
+    def integrate(self):
+        '''
+        Performs integration using the traperoidal rule
+        '''
+        rdtype,cdtype = get_dtypes(self.precision)
+        w  = self.depvar
+        wi = w.cumsum(axis=-1,dtype=rdtype)
+        self.depvar = ((2*wi[:,1:]-(w[:,:1]+w[:,1:]))*(self.delta/2.)).astype('float32')
+
+        # Re-assign b, e, npts
+        self.headers['b'] = (self.headers['b'] + self.delta/2.).astype(self.headers['b'].dtype)
+        self._update()
+
+        # All done
+        return
+
+
+    def filter(self, freq, order=4, btype='lowpass', zerophase=False):
+        '''
+        Filter all traces using a butterworth filter (see sac.filter)
+        '''
+
+        from . import filters
+
+        # Filter design (cached)
+        rdtype,cdtype = get_dtypes(self.precision)
+        sos = filters.butter(freq, self.delta, order, btype, rdtype)
+
+        # Filter waveforms
+        if zerophase:
+            depvar = signal.sosfiltfilt(sos, self.depvar, axis=-1)
+        else:
+            depvar = signal.sosfilt(sos, self.depvar, axis=-1)
+        self.depvar = depvar.astype('float32',copy=False)
+
+        # All done
+        return
+
+
+    def decimate(self, dec_fac):
+        '''
+        Decimates all traces (see sac.decimate)
+        '''
+
+        from . import decimate as decim
+
+        # Filter cascade
+        for c in decim.plan(dec_fac):
+            self.depvar = decim.decimate(self.depvar,decim.getfir(c),c)
+            self.delta *= np.float32(c)
+        self._update()
+
+        # All done
+        return
+
+
+    def _markertime(self,ref):
+        '''
+        Returns the time of a header marker for each trace (see sac._markertime)
+        '''
+        if ref in ('b','e','o','a'):
+            tref = self.headers[ref]
+        elif len(ref)==2 and ref[0]=='t' and ref[1].isdigit():
+            tref = self.headers['t'][:,int(ref[1])]
+        else:
+            raise ValueError('Incorrect reference marker (%s)'%(ref))
+        assert np.all(tref != -12345.), 'Reference marker %s must be assigned'%(ref)
+        # All done
+        return tref
+
+
+    def cut(self,t1,t2,ref='b',fill=0.):
+        '''
+        Cut the same time window relative to a marker in all traces
+        (see sac.cut). All traces are cut with npts = round((t2-t1)/delta)+1 
+        samples, starting at the sample closest to t1. depvar is a view of 
+        self.depvar if the window starts at the same sample in all traces 
+        and is within the data.
+        Returns a new SacArray
+        Args:
+            * t1, t2: time window relative to the ref marker
+            * ref: reference marker ('b', 'e', 'o', 'a' or 't0',...,'t9')
+            * fill: value of samples outside the data (e.g., 0. or np.nan)
+        '''
+        assert not self.spec, 'Can only cut seismograms in the time-domain'
+        assert t2 >= t1, 'Incorrect time window (t2 must be larger than t1)'
+        b    = self.headers['b']
+        i1   = np.round((self._markertime(ref) + t1 - b)/self.delta).astype(int)
+        npts = int(np.round((t2-t1)/self.delta)) + 1
+
+        # Cut data
+        res = self.copy(data=False)
+        if np.all(i1 == i1[0]) and i1[0] >= 0 and i1[0]+npts <= self.npts:
+            res.depvar = self.depvar[:,i1[0]:i1[0]+npts]
+        else:
+            idx   = i1[:,None] + np.arange(npts)[None,:]
+            valid = (idx >= 0) & (idx < self.npts)
+            res.depvar = self.depvar[np.arange(len(self))[:,None],np.clip(idx,0,self.npts-1)]
+            res.depvar[~valid] = fill
+
+        # Re-assign b, e, npts
+        res.headers['b'] = b + i1.astype(b.dtype)*self.delta
+        res._update()
+
+        # All done
+        return res
+
+
+    def freq(self):
+        '''
+        Returns the frequency vector of the current data
+        '''
+        # All done
+        return np.fft.rfftfreq(self.npts,d=self.delta)
+
+
+    def fft(self):
+        '''
+        Compute fourier transform of all traces
+        Output: spectra in the frequency domain (type: SacArray)
+        '''
+        from . import fftbackend
+        rdtype,cdtype = get_dtypes(self.precision)
+        spectrum = self.copy(data=False)
+        spectrum.spec = True
+        spectrum.depvar = fftbackend.rfft(self.depvar.astype(rdtype,copy=False),axis=-1).astype(cdtype,copy=False)
+
+        # All done
+        return spectrum
+
+
+    def ifft(self):
+        '''
+        Compute the inverse fourier transform of all traces
+        Output: traces in the time domain (type: SacArray)
+        '''
+        from . import fftbackend
+        rdtype,cdtype = get_dtypes(self.precision)
+        seis = self.copy(data=False)
+        seis.spec = False
+        seis.depvar = fftbackend.irfft(self.depvar.astype(cdtype,copy=False),axis=-1).astype(rdtype,copy=False)
+
+        # All done
+        return seis
+
+
+    def convresp(self,PZ):
+        '''
+        Convolve all traces with the same instrument response (see sac.convresp)
+        Args:
+            * PZ: dictionary including 'poles', 'zeros' and 'Const'
+        '''
+        from . import response
+        self.depvar = response.convolve(self.depvar,self.delta,PZ,self.precision)
+        self._update()
+        # All done
+        return
+
+
+    def removeresp(self,PZ,water_level=60.,prefilt=None):
+        '''
+        Remove the same instrument response from all traces (see sac.removeresp)
+        '''
+        from . import response
+        self.depvar = response.deconvolve(self.depvar,self.delta,PZ,water_level,prefilt,self.precision)
+        self._update()
+        # All done
+        return
+
+
+def column(values):
+    '''
+    Build a header column from a list of values (one per trace)
+    '''
+    v0 = values[0]
+    if isinstance(v0,np.ndarray):
+        return np.stack(values)
+    if isinstance(v0,(np.generic,int,float,bool)):
+        return np.array(values)
+    col = np.empty((len(values),),dtype=object)
+    for i,v in enumerate(values):
+        col[i] = v
+    # All done
+    return col
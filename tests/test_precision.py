@@ -0,0 +1,80 @@
+'''
+Numerical error of single precision processing with respect to double precision
+(see set_precision). Run from the directory including sacpy:
+    python -m pytest sacpy/tests
+'''
+
+import numpy as np
+import pytest
+
+from sacpy.benchmarks.synthetic import synthetic_trace
+
+
+# Fixed synthetic trace
+NPTS = 100000
+
+# Instrument response (STS-1 like)
+PZ = {'zeros': [0j,0j],
+      'poles': [-0.037+0.037j,-0.037-0.037j,-251.+0j,-131.+467j,-131.-467j],
+      'Const': 6.e7}
+
+
+def run_filter(tr):
+    tr.filter(1.)
+    return tr.depvar
+
+def run_fft(tr):
+    return tr.fft().depvar
+
+def run_ifft(tr):
+    return tr.fft().ifft().depvar
+
+def run_integrate(tr):
+    tr.integrate()
+    return tr.depvar
+
+def run_convresp(tr):
+    tr.convresp(PZ)
+    return tr.depvar
+
+def run_removeresp(tr):
+    tr.removeresp(PZ,60.,(0.01,0.02,10.,20.))
+    return tr.depvar
+
+
+# Cases: name: (method, bound on the relative error, dtype in single and double precision)
+CASES = {
+    'filter':     (run_filter,     1e-4, 'float32',   'float32'),
+    'fft':        (run_fft,        1e-5, 'complex64', 'complex128'),
+    'ifft':       (run_ifft,       1e-5, 'float32',   'float64'),
+    'integrate':  (run_integrate,  1e-3, 'float32',   'float32'),
+    'convresp':   (run_convresp,   1e-5, 'float32',   'float32'),
+    'removeresp': (run_removeresp, 1e-5, 'float32',   'float32'),
+}
+
+
+def process(name, precision):
+    '''
+    Returns the output of a case for a given precision
+    '''
+    tr = synthetic_trace(NPTS)
+    tr.precision = precision
+    # All done
+    return CASES[name][0](tr)
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_dtype(name):
+    func,bound,single,double = CASES[name]
+    assert process(name,'single').dtype == np.dtype(single)
+    assert process(name,'double').dtype == np.dtype(double)
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_relative_error(name):
+    func,bound,single,double = CASES[name]
+    d = process(name,'double').astype('complex128')
+    s = process(name,'single').astype('complex128')
+    assert np.isfinite(d).all()
+    err = np.abs(s-d).max()/np.abs(d).max()
+    assert err < bound, '%s: relative error %.2e > %.0e'%(name,err,bound)